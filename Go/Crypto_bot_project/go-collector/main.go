@@ -3,6 +3,8 @@ package main
 import (
 	"encoding/json"
 	"log"
+	"net"
+	"os"
 	"time"
 
 	"github.com/gorilla/websocket"
@@ -12,25 +14,39 @@ import (
 // Python: 不需要定義，直接用 dict['c']。
 // Go: 必須先定義結構。這裡我們只提取我們需要的字段。
 type BinanceTicker struct {
-	Symbol string `json:"s"` // "s" 是 Binance JSON 裡的 key，映射到 Go 的 Symbol 變量
-	Price  string `json:"c"` // "c" 代表最新成交價 (Current Price)
+	Symbol    string `json:"s"` // "s" 是 Binance JSON 裡的 key，映射到 Go 的 Symbol 變量
+	Price     string `json:"c"` // "c" 代表最新成交價 (Current Price)
+	EventTime int64  `json:"E"` // "E" 是交易所的事件時間 (毫秒)
+}
+
+// 轉發給 Python 策略端 (stream_bridge.py) 的 Tick，一行一個 JSON
+type bridgeTick struct {
+	Symbol    string `json:"s"`
+	Price     string `json:"c"`
+	EventTime int64  `json:"E"`
+	RecvTime  int64  `json:"t"` // collector 收到的時間 (納秒)，Python 端用來統計延遲
 }
 
 // 定義 WebSocket 地址 (Binance 現貨市場 - Mini Ticker 1000ms 推送一次)
 const wsURL = "wss://stream.binance.com:9443/ws/btcusdt@miniTicker"
 
+// Python 橋接的 Unix socket 路徑 (可用環境變量 CRYPTO_BRIDGE_SOCKET 覆蓋)
+const defaultBridgeSocket = "/tmp/crypto_ticks.sock"
+
 func main() {
 	// 2. 建立一個 Channel (通道)
 	// Python: 類似 Queue.Queue()
 	// 作用: 讓 "接收數據的協程" 和 "處理數據的協程" 解耦。
-	priceChan := make(chan string)
+	// 帶緩衝：Python 端暫時寫不進去時，不會卡住 WebSocket 讀取
+	priceChan := make(chan bridgeTick, 1024)
 
 	// 3. 啟動 "消費者" Goroutine (模擬寫入 Redis 的部分)
 	// 關鍵點: 這個協程一旦啟動，就會一直運行，不會因為 WebSocket 斷線而停止。
 	go func() {
-		for price := range priceChan {
-			// 在這裡，未來您會把代碼換成: redisClient.Set("BTC", price)
-			log.Printf("收到價格並處理: %s", price)
+		forwarder := &bridgeForwarder{path: bridgeSocketPath()}
+		for tick := range priceChan {
+			log.Printf("收到價格並處理: %s", tick.Price)
+			forwarder.send(tick)
 		}
 	}()
 
@@ -53,7 +69,7 @@ func main() {
 }
 
 // 這是負責維持連接的函數
-func connectAndListen(ch chan<- string) error {
+func connectAndListen(ch chan<- bridgeTick) error {
 	// Dial 建立連接
 	c, _, err := websocket.DefaultDialer.Dial(wsURL, nil)
 	if err != nil {
@@ -83,8 +99,66 @@ func connectAndListen(ch chan<- string) error {
 			continue
 		}
 
-		// 將價格發送到 Channel
-		// 注意: 這裡是非阻塞的，數據丟進去，上面的 "消費者 Goroutine" 就會收到
-		ch <- ticker.Price
+		// 將價格發送到 Channel，上面的 "消費者 Goroutine" 就會收到
+		// 非阻塞: 緩衝區滿 (消費者跟不上) 時丟棄該 Tick 並計數，不卡住 WebSocket 讀取
+		tick := bridgeTick{
+			Symbol:    ticker.Symbol,
+			Price:     ticker.Price,
+			EventTime: ticker.EventTime,
+			RecvTime:  time.Now().UnixNano(),
+		}
+		select {
+		case ch <- tick:
+		default:
+			droppedTicks++
+			if droppedTicks%1000 == 1 {
+				log.Printf("Channel 已滿，丟棄 Tick (累計 %d)", droppedTicks)
+			}
+		}
+	}
+}
+
+// Channel 已滿時丟棄的 Tick 數 (只在生產者協程中讀寫)
+var droppedTicks uint64
+
+func bridgeSocketPath() string {
+	if path := os.Getenv("CRYPTO_BRIDGE_SOCKET"); path != "" {
+		return path
+	}
+	return defaultBridgeSocket
+}
+
+// 把 Tick 寫入 Python 橋接的 Unix socket
+// Python 端沒啟動或斷開時直接丟棄該 Tick，每 5 秒最多重連一次，不影響採集
+type bridgeForwarder struct {
+	path     string
+	conn     net.Conn
+	nextDial time.Time
+}
+
+func (f *bridgeForwarder) send(tick bridgeTick) {
+	if f.conn == nil {
+		if time.Now().Before(f.nextDial) {
+			return
+		}
+		conn, err := net.DialTimeout("unix", f.path, 100*time.Millisecond)
+		if err != nil {
+			f.nextDial = time.Now().Add(5 * time.Second)
+			return
+		}
+		log.Printf("已連接 Python 橋接: %s", f.path)
+		f.conn = conn
+	}
+
+	line, err := json.Marshal(tick)
+	if err != nil {
+		return
+	}
+	// 寫入超時: Python 端卡住時寧可斷開重連，也不要堵住整條管道
+	f.conn.SetWriteDeadline(time.Now().Add(50 * time.Millisecond))
+	if _, err := f.conn.Write(append(line, '\n')); err != nil {
+		log.Printf("轉發到 Python 失敗: %v", err)
+		f.conn.Close()
+		f.conn = nil
 	}
 }
\ No newline at end of file
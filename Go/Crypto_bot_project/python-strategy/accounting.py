@@ -0,0 +1,70 @@
+from metrics import TradeRecorder
+
+class Account:
+    """
+    單一品種的倉位/手續費/盈虧記帳核心
+    BacktestEngine (run / run_fast / run_stream) 與 PaperTrader 共用同一套進出場算式，
+    保證回測與模擬盤的資金變化完全一致
+    """
+    def __init__(self, balance=10000, fee_rate=0.001, trades=None, signals=None):
+        self.balance = balance
+        self.fee_rate = fee_rate
+        self.trades = trades if trades is not None else TradeRecorder()
+        self.signals = signals if signals is not None else []
+        self.reset_position()
+
+    def reset_position(self):
+        """清空持倉狀態 (資金不變)"""
+        self.in_position = False
+        self.position_size = 0
+        self.entry_price = 0
+        self.stop_loss = 0
+        self.take_profit = 0
+        self.entry_time = None
+
+    def equity(self, price):
+        """按市價計算權益 (持倉部分預扣平倉手續費)"""
+        if not self.in_position:
+            return self.balance
+        mkt_value = self.position_size * price
+        return self.balance + mkt_value - mkt_value * self.fee_rate
+
+    def exit_reason(self, price):
+        """收盤價觸及止損/止盈時返回原因，否則返回 None"""
+        if price <= self.stop_loss: return "Stop Loss"
+        if price >= self.take_profit: return "Take Profit"
+        return None
+
+    def open(self, time, price, size, stop_loss, take_profit, reason):
+        """開倉；倉位為 0 或資金不足 (含手續費) 時不成交，返回是否成交"""
+        if size <= 0:
+            return False
+        cost = size * price
+        fee = cost * self.fee_rate
+        if self.balance < (cost + fee):
+            return False
+
+        self.balance -= (cost + fee)
+        self.position_size = size
+        self.entry_price = price
+        self.stop_loss = stop_loss
+        self.take_profit = take_profit
+        self.in_position = True
+        self.entry_time = time
+
+        self.signals.append({'time': time, 'price': price, 'type': 'BUY', 'reason': reason})
+        return True
+
+    def close(self, time, price, reason):
+        """平倉並記錄交易，返回該筆 PnL"""
+        revenue = self.position_size * price
+        fee = revenue * self.fee_rate
+        self.balance += (revenue - fee)
+
+        pnl = (revenue - fee) - (self.entry_price * self.position_size * (1 + self.fee_rate))
+
+        self.signals.append({'time': time, 'price': price, 'type': 'SELL', 'reason': reason})
+        self.trades.append(self.entry_time, time, self.entry_price, price, self.position_size, pnl)
+
+        self.reset_position()
+        return pnl
\ No newline at end of file
@@ -1,123 +1,455 @@
+import os
+import tempfile
 import pandas as pd
 import numpy as np
 import matplotlib.pyplot as plt
+from metrics import EquityRecorder, compute_metrics
+from accounting import Account
+from profiler import NULL_PROFILER
 
 class BacktestEngine:
-    def __init__(self, initial_balance=10000, fee_rate=0.001):
+    EXIT_MODES = ('close', 'intrabar')
+    SAME_BAR_RULES = ('stop_first', 'target_first')
+
+    def __init__(self, initial_balance=10000, fee_rate=0.001, exit_mode='close', same_bar_rule='stop_first', slippage=0.0,
+                 profiler=None):
+        """
+        exit_mode: 'close' 只用收盤價判斷止損/止盈 (原始行為)；
+                   'intrabar' 用 High/Low 找出第一根觸及 SL/TP 的K線，並以該價位成交
+        same_bar_rule: 同一根K線同時觸及 SL 與 TP 時先成交哪一個 ('stop_first' 保守 / 'target_first')
+        slippage: intrabar 模式下 SL/TP 成交價的不利滑價比例 (例如 0.0005 = 5bps)
+        profiler: profiler.RunProfiler，記錄 prepare_indicators / generate_signals / bar_loop / plot 各階段耗時
+        """
+        if exit_mode not in self.EXIT_MODES:
+            raise ValueError(f"exit_mode must be one of {self.EXIT_MODES}")
+        if same_bar_rule not in self.SAME_BAR_RULES:
+            raise ValueError(f"same_bar_rule must be one of {self.SAME_BAR_RULES}")
+
         self.initial_balance = initial_balance
-        self.balance = initial_balance
         self.fee_rate = fee_rate
+        self.exit_mode = exit_mode
+        self.same_bar_rule = same_bar_rule
+        self.slippage = slippage
+        self.profiler = profiler or NULL_PROFILER
         self.equity_curve = []
-        self.signals = []
-        self.trade_log = []
+        self.account = Account(initial_balance, fee_rate) # 資金/持倉/交易記錄 (與 PaperTrader 共用)
+        self._open_entry_time = None # 回測結束時仍持倉的進場時間
+        self._stream_dir = None # run_stream 未指定 equity_path 時的臨時目錄 (由引擎持有)
+
+    @property
+    def balance(self):
+        return self.account.balance
+
+    @balance.setter
+    def balance(self, value):
+        self.account.balance = value
+
+    @property
+    def trades(self):
+        """結構化陣列交易記錄 (TradeRecorder)"""
+        return self.account.trades
+
+    @property
+    def signals(self):
+        return self.account.signals
+
+    @property
+    def trade_log(self):
+        """兼容舊接口：每筆交易一個 {'pnl': ...} 字典"""
+        return [{'pnl': pnl} for pnl in self.trades.pnl.tolist()]
 
     def run(self, df, strategy_instance):
         """執行回測循環"""
         # 1. 計算指標
-        df = strategy_instance.prepare_indicators(df)
+        with self.profiler.stage('prepare_indicators', bars=len(df)):
+            df = strategy_instance.prepare_indicators(df)
         
-        # 變數初始化
-        in_position = False
-        position_size = 0
-        entry_price = 0
-        stop_loss = 0
-        take_profit = 0
+        # 持倉狀態初始化 (資金延續)
+        account = self.account
+        account.reset_position()
         
         self.equity_curve = [] # 重置曲線
+        recorder = EquityRecorder(len(df)) # 預分配權益曲線
+        ohlc = self._intrabar_arrays(df)
         
         print(f"--- Running Backtest on {len(df)} bars ---")
 
-        for i in range(len(df)):
-            curr_row = df.iloc[i]
-            prev_row = df.iloc[i-1] if i > 0 else curr_row
-            timestamp = df.index[i]
-            price = curr_row['Close']
+        with self.profiler.stage('bar_loop', bars=len(df)):
+            for i in range(len(df)):
+                curr_row = df.iloc[i]
+                prev_row = df.iloc[i-1] if i > 0 else curr_row
+                timestamp = df.index[i]
+                price = curr_row['Close']
             
-            # 更新權益曲線
-            if in_position:
-                mkt_value = position_size * price
-                est_fee = mkt_value * self.fee_rate
-                equity = self.balance + mkt_value - est_fee
-            else:
-                equity = self.balance
-            self.equity_curve.append({'time': timestamp, 'equity': equity})
+                # 更新權益曲線
+                recorder.append(account.equity(price))
 
-            if i < 1: continue
+                if i < 1: continue
 
-            # --- 檢查出場 (止盈/止損) ---
-            if in_position:
-                exit_reason = None
-                if price <= stop_loss: exit_reason = "Stop Loss"
-                elif price >= take_profit: exit_reason = "Take Profit"
+                # --- 檢查出場 (止盈/止損) ---
+                if account.in_position:
+                    if ohlc is not None:
+                        # intrabar: 盤中觸及 SL/TP 時以該價位成交，優先於收盤時的技術性賣出
+                        fill, exit_reason = self._intrabar_fill(i, *ohlc, account.stop_loss, account.take_profit)
+                        if exit_reason is None:
+                            sig_type, _, _, _, sig_reason = strategy_instance.get_signal(curr_row, prev_row, account.balance, self.fee_rate)
+                            if sig_type == 'SELL': fill, exit_reason = price, sig_reason
+                        if exit_reason:
+                            account.close(timestamp, fill, exit_reason)
+                            # 盤中已成交：出場K線記為平倉後的餘額 (與 run_fast 相同)
+                            recorder.values[i] = account.balance
+                        continue
+
+                    exit_reason = account.exit_reason(price)
                 
-                # 詢問策略是否要技術性賣出 (死叉)
-                sig_type, _, _, _, sig_reason = strategy_instance.get_signal(curr_row, prev_row, self.balance, self.fee_rate)
-                if sig_type == 'SELL': exit_reason = sig_reason
-
-                if exit_reason:
-                    # 執行賣出
-                    revenue = position_size * price
-                    fee = revenue * self.fee_rate
-                    self.balance += (revenue - fee)
-                    
-                    pnl = (revenue - fee) - (entry_price * position_size * (1 + self.fee_rate))
-                    
-                    self.signals.append({'time': timestamp, 'price': price, 'type': 'SELL', 'reason': exit_reason})
-                    self.trade_log.append({'pnl': pnl})
-                    
-                    in_position = False
-                    position_size = 0
-
-            # --- 檢查進場 ---
-            elif not in_position:
-                sig_type, size, sl, tp, reason = strategy_instance.get_signal(curr_row, prev_row, self.balance, self.fee_rate)
+                    # 詢問策略是否要技術性賣出 (死叉)
+                    sig_type, _, _, _, sig_reason = strategy_instance.get_signal(curr_row, prev_row, account.balance, self.fee_rate)
+                    if sig_type == 'SELL': exit_reason = sig_reason
+
+                    if exit_reason:
+                        # 執行賣出
+                        account.close(timestamp, price, exit_reason)
+
+                # --- 檢查進場 ---
+                else:
+                    sig_type, size, sl, tp, reason = strategy_instance.get_signal(curr_row, prev_row, account.balance, self.fee_rate)
                 
-                if sig_type == 'BUY' and size > 0:
-                    cost = size * price
-                    fee = cost * self.fee_rate
-                    if self.balance >= (cost + fee):
-                        self.balance -= (cost + fee)
-                        position_size = size
-                        entry_price = price
-                        stop_loss = sl
-                        take_profit = tp
-                        in_position = True
-                        
-                        self.signals.append({'time': timestamp, 'price': price, 'type': 'BUY', 'reason': reason})
-
-        return pd.DataFrame(self.equity_curve).set_index('time')
+                    if sig_type == 'BUY':
+                        account.open(timestamp, price, size, sl, tp, reason)
+
+        self._open_entry_time = account.entry_time if account.in_position else None
+        self.equity_curve = pd.DataFrame({'time': df.index, 'equity': recorder.array})
+        return self.equity_curve.set_index('time')
+
+    def run_fast(self, df, strategy_instance, start=None):
+        """
+        快速回測模式 (結果與 run 完全一致)
+        策略需實現 generate_signals(df)，一次性返回 entries/exits 布林陣列與 SL/TP 距離；
+        引擎只在「事件K線」上執行狀態循環：
+        - 空倉時：直接跳到下一根進場信號K線
+        - 持倉時：分塊向量化搜尋下一根觸及 SL/TP 或出場信號的K線
+        權益曲線按持倉區段整段向量化填充，不再逐根 df.iloc
+        未實現 generate_signals 的策略 (需要逐根狀態) 自動回退到 run
+        start: 從這個時間開始交易與記錄權益，之前的K線只用於指標預熱 (與 run_stream 的分塊前綴相同)
+        """
+        if not hasattr(strategy_instance, 'generate_signals'):
+            if start is not None:
+                raise ValueError("run_fast(start=...) requires a strategy implementing generate_signals")
+            return self.run(df, strategy_instance)
+
+        # 1. 計算指標與信號向量
+        with self.profiler.stage('prepare_indicators', bars=len(df)):
+            df = strategy_instance.prepare_indicators(df)
+        with self.profiler.stage('generate_signals', bars=len(df)):
+            sig = strategy_instance.generate_signals(df)
+
+        close = df['Close'].to_numpy(dtype=np.float64)
+        n = len(close)
+
+        self.equity_curve = [] # 重置曲線
+
+        print(f"--- Running Fast Backtest on {n} bars ---")
+
+        equity = np.empty(n, dtype=np.float64)
+        self.account.reset_position()
+        # 第 0 根K線只記錄權益，不交易；指定 start 時從 start 開始 (前綴提供上一根指標，第一根即可交易)
+        first = 0 if start is None else int(df.index.searchsorted(start))
+        with self.profiler.stage('bar_loop', bars=n - first):
+            self._simulate(df.index, close, sig, strategy_instance, equity, fill_from=first, trade_from=max(first, 1),
+                           ohlc=self._intrabar_arrays(df))
+        self._open_entry_time = self.account.entry_time if self.account.in_position else None
+
+        # 直接以欄位形式保存 (與 pd.DataFrame(list_of_dicts) 結構相同)，避免建立數百萬個 dict
+        self.equity_curve = pd.DataFrame({'time': df.index[first:], 'equity': equity[first:]})
+        return self.equity_curve.set_index('time')
+
+    def run_stream(self, chunks, strategy_instance, equity_path=None):
+        """
+        串流/分塊回測模式 (適用於大於記憶體的數據集)
+        chunks: 可迭代的 DataFrame 分塊 (例如 DataLoader.iter_chunks)，需按時間排序
+        - 每塊前面拼接上一塊末尾 warmup_bars 根原始K線，使滾動指標與不分塊時一致
+        - 持倉狀態 (倉位/止損/止盈) 與資金在分塊之間延續
+        - 權益曲線逐塊寫入磁碟 (equity_path.time / equity_path.equity)，返回 memmap 支撐的 DataFrame
+          equity_path 由調用者管理；為 None 時寫入引擎持有的臨時目錄，
+          在下一次 run_stream、close() 或引擎被回收時刪除 (之後不要再使用返回的 DataFrame)
+        峰值記憶體只與分塊大小有關，與歷史長度無關：每塊的指標使用只屬於該塊的臨時快取，
+        不寫進策略的共用快取 (每塊指紋都不同，放進共用快取只會隨歷史長度增長而不會再命中)
+        注意：滾動均值在每塊重新累加，與整段計算有 ~1e-12 級浮點差異，快慢線恰好相等的交叉點可能判斷不同
+        """
+        if not hasattr(strategy_instance, 'generate_signals'):
+            raise ValueError("run_stream requires a strategy implementing generate_signals")
+
+        self.close()
+        if equity_path is None:
+            self._stream_dir = tempfile.TemporaryDirectory(prefix='equity_', ignore_cleanup_errors=True)
+            equity_path = os.path.join(self._stream_dir.name, 'equity')
+        time_path, value_path = f"{equity_path}.time", f"{equity_path}.equity"
+
+        warmup_bars = getattr(strategy_instance, 'warmup_bars', 0)
+        self.account.reset_position()
+        tail = None # 上一塊末尾的原始K線 (指標預熱用)
+        total = 0
+
+        self.equity_curve = [] # 重置曲線
+
+        print("--- Running Streaming Backtest ---")
+
+        from indicators import IndicatorCache
+        shared_cache = getattr(strategy_instance, 'indicator_cache', None)
+        try:
+            with open(time_path, 'wb') as f_time, open(value_path, 'wb') as f_value:
+                for chunk in chunks:
+                    if len(chunk) == 0:
+                        continue
+                    if shared_cache is not None:
+                        strategy_instance.indicator_cache = IndicatorCache()
+                    first_time = chunk.index[0]
+                    raw = chunk if tail is None else pd.concat([tail, chunk])
+                    tail = raw.iloc[-warmup_bars:] if warmup_bars else raw.iloc[:0]
+
+                    with self.profiler.stage('prepare_indicators', bars=len(raw)):
+                        df = strategy_instance.prepare_indicators(raw)
+                    with self.profiler.stage('generate_signals', bars=len(df)):
+                        sig = strategy_instance.generate_signals(df)
+                    close = df['Close'].to_numpy(dtype=np.float64)
+
+                    # 第一塊與 run_fast 相同 (第 0 根不交易)；之後的塊從新數據的第一根開始
+                    start = 0 if total == 0 else int(df.index.searchsorted(first_time))
+                    equity = np.empty(len(close), dtype=np.float64)
+                    with self.profiler.stage('bar_loop', bars=len(close) - start):
+                        self._simulate(df.index, close, sig, strategy_instance, equity,
+                                       fill_from=start, trade_from=max(start, 1), ohlc=self._intrabar_arrays(df))
+
+                    df.index[start:].values.astype('datetime64[ns]').view('int64').tofile(f_time)
+                    equity[start:].tofile(f_value)
+                    total += len(close) - start
+                    print(f"  processed {total} bars")
+        finally:
+            if shared_cache is not None:
+                strategy_instance.indicator_cache = shared_cache
+
+        self._open_entry_time = self.account.entry_time if self.account.in_position else None
+
+        epoch = np.memmap(time_path, dtype=np.int64, mode='r') if total else np.empty(0, dtype=np.int64)
+        values = np.memmap(value_path, dtype=np.float64, mode='r') if total else np.empty(0, dtype=np.float64)
+        self.equity_curve = pd.DataFrame({'time': epoch.view('datetime64[ns]'), 'equity': values}, copy=False)
+        return self.equity_curve.set_index('time')
+
+    def close(self):
+        """刪除 run_stream 的臨時權益檔 (指定了 equity_path 時不會刪除調用者的檔案)"""
+        if self._stream_dir is not None:
+            self.equity_curve = []
+            self._stream_dir.cleanup()
+            self._stream_dir = None
+
+    def _intrabar_arrays(self, df):
+        """
+        intrabar 模式需要的 (Open, High, Low) 陣列；close 模式返回 None
+        lean 數據中仍為 float32 的欄位按 df.attrs['price_decimals'] 精確還原 (見 strategy.price_frame)
+        """
+        if self.exit_mode != 'intrabar':
+            return None
+        decimals = df.attrs.get('price_decimals')
+        arrays = []
+        for col in ('Open', 'High', 'Low'):
+            values = df[col].to_numpy()
+            if values.dtype == np.float32 and decimals is not None:
+                values = np.round(values.astype(np.float64), decimals)
+            arrays.append(values.astype(np.float64, copy=False))
+        return tuple(arrays)
+
+    def _simulate(self, index, close, sig, strategy_instance, equity, fill_from, trade_from, ohlc=None):
+        """
+        事件驅動的狀態循環 (run_fast / run_stream 共用)
+        - 空倉時：直接跳到下一根進場信號K線
+        - 持倉時：分塊向量化搜尋下一根觸及 SL/TP 或出場信號的K線
+          (ohlc 不為 None 時用 Low/High 判斷觸及，並以 SL/TP 價位成交)
+        equity[fill_from:] 按持倉區段整段填充；持倉狀態與資金在 self.account 中原地更新 (可在分塊之間延續)
+        """
+        entries = np.asarray(sig['entries'], dtype=bool)
+        exits = np.asarray(sig['exits'], dtype=bool)
+        sl_distance = np.asarray(sig['sl_distance'], dtype=np.float64)
+        tp_distance = np.asarray(sig['tp_distance'], dtype=np.float64)
+        entry_reason = sig.get('entry_reason')
+        exit_reason_sig = sig.get('exit_reason')
+        n = len(close)
+
+        intrabar = ohlc is not None
+        if intrabar:
+            open_, high, low = ohlc
+        else:
+            open_, high, low = None, close, close
+
+        entry_idx = np.flatnonzero(entries[trade_from:]) + trade_from
+
+        account = self.account
+        seg_start = fill_from # 當前狀態區段的起點 (權益曲線填充用)
+        i = trade_from
+
+        while i < n:
+            if not account.in_position:
+                # --- 檢查進場：跳到下一個進場信號 ---
+                k = np.searchsorted(entry_idx, i)
+                if k == len(entry_idx): break
+                j = int(entry_idx[k])
+                i = j + 1
+
+                price = float(close[j])
+                sl_dist = float(sl_distance[j])
+                size = strategy_instance.position_size(account.balance, price, sl_dist, self.fee_rate)
+                balance_before = account.balance
+                if account.open(index[j], price, size, price - sl_dist, price + float(tp_distance[j]), entry_reason):
+                    # 進場K線的權益仍以進場前狀態計算
+                    equity[seg_start:j + 1] = balance_before
+                    seg_start = j + 1
+            else:
+                # --- 檢查出場：搜尋下一根 SL/TP/出場信號 K線 ---
+                j = self._find_exit_candidate(low, high, exits, i, account.stop_loss, account.take_profit)
+                if j < 0: break
+                i = j + 1
+
+                if intrabar:
+                    price, exit_reason = self._intrabar_fill(j, open_, high, low, account.stop_loss, account.take_profit)
+                    if exit_reason is None:
+                        # 盤中未觸及 SL/TP，收盤時的技術性賣出
+                        price, exit_reason = float(close[j]), exit_reason_sig
+
+                    # 盤中已成交：出場K線之前以持倉狀態計算，出場K線本身記為平倉後的餘額
+                    self._fill_position(equity, close, seg_start, j)
+                else:
+                    price = float(close[j])
+                    exit_reason = account.exit_reason(price)
+                    # 策略的技術性賣出 (例如死叉) 優先
+                    if exits[j]: exit_reason = exit_reason_sig
+
+                    # 出場K線的權益以持倉狀態計算
+                    self._fill_position(equity, close, seg_start, j + 1)
+                seg_start = j + 1
+
+                # 執行賣出
+                account.close(index[j], price, exit_reason)
+                if intrabar:
+                    equity[j] = account.balance
+
+        # 填充最後一段
+        if account.in_position:
+            self._fill_position(equity, close, seg_start, n)
+        else:
+            equity[seg_start:] = account.balance
+
+    def _fill_position(self, equity, close, start, end):
+        """持倉區段的權益 (與 Account.equity 相同算式，整段向量化)"""
+        mkt_value = self.account.position_size * close[start:end]
+        equity[start:end] = self.account.balance + mkt_value - mkt_value * self.fee_rate
+
+    def _intrabar_fill(self, j, open_, high, low, stop_loss, take_profit):
+        """
+        盤中 SL/TP 成交價與原因；都未觸及時返回 (None, None)
+        開盤價已跳空越過價位時按開盤價成交 (與 same_bar_rule 無關，開盤就已經越過)，再加上不利滑價
+        """
+        price = float(open_[j])
+        if price <= stop_loss:
+            return price * (1 - self.slippage), "Stop Loss"
+        if price >= take_profit:
+            return price * (1 - self.slippage), "Take Profit"
+
+        hit_sl = low[j] <= stop_loss
+        hit_tp = high[j] >= take_profit
+        if hit_sl and hit_tp:
+            # 同一根K線同時觸及，按規則決定先後
+            if self.same_bar_rule == 'stop_first': hit_tp = False
+            else: hit_sl = False
+
+        if hit_sl:
+            return stop_loss * (1 - self.slippage), "Stop Loss"
+        if hit_tp:
+            return take_profit * (1 - self.slippage), "Take Profit"
+        return None, None
+
+    @staticmethod
+    def _find_exit_candidate(low, high, exits, start, stop_loss, take_profit, block=1024):
+        """
+        從 start 開始分塊搜尋第一根 Low <= SL、High >= TP 或出現出場信號的K線，找不到返回 -1
+        (close 模式下 low/high 都傳入 Close)
+        """
+        n = len(low)
+        while start < n:
+            end = min(start + block, n)
+            hit = (low[start:end] <= stop_loss) | (high[start:end] >= take_profit) | exits[start:end]
+            pos = int(hit.argmax())
+            if hit[pos]:
+                return start + pos
+            start = end
+            block *= 2 # 長期持倉時逐步擴大搜尋窗口
+        return -1
+
+    def performance(self):
+        """向量化計算績效指標，返回 dict (不打印)"""
+        if len(self.equity_curve) == 0:
+            return compute_metrics([], self.trades.pnl, self.initial_balance)
+
+        df_equity = pd.DataFrame(self.equity_curve)
+        times = df_equity['time'].to_numpy().astype('datetime64[ns]').view('int64')
+        trades = self.trades.array
+        if self._open_entry_time is not None:
+            # 仍持倉的部分也計入持倉比例
+            open_trade = np.zeros(1, dtype=trades.dtype)
+            open_trade['entry_time'] = np.datetime64(self._open_entry_time, 'ns').astype(np.int64)
+            open_trade['exit_time'] = times[-1]
+            trades = np.concatenate([trades, open_trade])
+
+        return compute_metrics(df_equity['equity'].to_numpy(), self.trades.pnl, self.initial_balance,
+                               times=times, trades=trades)
 
     def print_performance(self):
-        """打印績效報告"""
-        if not self.trade_log:
+        """打印績效報告，並返回指標 dict"""
+        metrics = self.performance()
+        if metrics['trades'] == 0:
             print("No trades generated.")
-            return
+            return metrics
 
-        df_equity = pd.DataFrame(self.equity_curve)
-        final_equity = df_equity['equity'].iloc[-1]
-        total_return = (final_equity - self.initial_balance) / self.initial_balance * 100
-        
-        wins = [t['pnl'] for t in self.trade_log if t['pnl'] > 0]
-        losses = [t['pnl'] for t in self.trade_log if t['pnl'] <= 0]
-        win_rate = len(wins) / len(self.trade_log) * 100 if self.trade_log else 0
-        
         print(f"\n{'='*30}")
         print(f"PERFORMANCE REPORT")
         print(f"{'='*30}")
-        print(f"Final Equity : ${final_equity:.2f}")
-        print(f"Total Return : {total_return:.2f}%")
-        print(f"Total Trades : {len(self.trade_log)}")
-        print(f"Win Rate     : {win_rate:.2f}%")
-        print(f"Avg Win      : ${np.mean(wins) if wins else 0:.2f}")
-        print(f"Avg Loss     : ${np.mean(losses) if losses else 0:.2f}")
+        print(f"Final Equity : ${metrics['final_equity']:.2f}")
+        print(f"Total Return : {metrics['total_return']:.2f}%")
+        print(f"Max Drawdown : {metrics['max_drawdown']:.2f}% ({metrics['max_drawdown_days']:.1f} days)")
+        print(f"Sharpe       : {metrics['sharpe']:.2f}")
+        print(f"Sortino      : {metrics['sortino']:.2f}")
+        print(f"Exposure     : {metrics['exposure']:.2f}%")
+        print(f"Total Trades : {metrics['trades']}")
+        print(f"Win Rate     : {metrics['win_rate']:.2f}%")
+        print(f"Profit Factor: {metrics['profit_factor']:.2f}")
+        print(f"Avg Win      : ${metrics['avg_win']:.2f}")
+        print(f"Avg Loss     : ${metrics['avg_loss']:.2f}")
         print(f"{'='*30}\n")
+        return metrics
+
+    def plot_results(self, df_price, title="Backtest Result", method='resample', path=None):
+        """
+        繪圖功能 (優化版：降頻以提升速度 + 死亡點標記)
+        method: 'resample' 固定 4H 降頻 (原始行為)；
+                'minmax' / 'lttb' 按像素寬度降採樣並標記所有買賣點 (見 plotting.plot_backtest，保留回撤尖刺)
+        path: 給出時不彈出視窗，直接保存圖片 (無 GUI 環境可用)
+        """
+        with self.profiler.stage('plot', bars=len(self.equity_curve)):
+            return self._plot_results(df_price, title, method, path)
 
-    def plot_results(self, df_price, title="Backtest Result"):
-        """繪圖功能 (優化版：降頻以提升速度 + 死亡點標記)"""
-        if not self.equity_curve:
+    def _plot_results(self, df_price, title, method, path):
+        if len(self.equity_curve) == 0:
             print("No data to plot.")
             return
 
+        if method != 'resample':
+            from plotting import plot_backtest
+            curve = pd.DataFrame(self.equity_curve)
+            fig = plot_backtest(df_price.index, df_price['Close'].to_numpy(), curve['time'].to_numpy(),
+                                curve['equity'].to_numpy(), self.initial_balance, self.signals, title=title,
+                                path=path, method=method)
+            if path is None:
+                plt.show()
+            return fig
+
         # 1. 轉換為 DataFrame
         df_equity = pd.DataFrame(self.equity_curve)
         if 'time' not in df_equity.columns: return
@@ -127,10 +459,10 @@ class BacktestEngine:
         # 2. 數據降頻 (Resampling) - 關鍵！
         # 500萬點畫不出來，我們每 1 小時取一個點 (1H)
         # 這樣圖表會非常清晰，且秒開
-        equity_resampled = df_equity['equity'].resample('4H').last().dropna()
+        equity_resampled = df_equity['equity'].resample('4h').last().dropna()
         
         # 為了對照，價格也降頻
-        price_resampled = df_price['Close'].resample('4H').last().dropna()
+        price_resampled = df_price['Close'].resample('4h').last().dropna()
         
         # 找出對齊的時間段
         common_idx = equity_resampled.index.intersection(price_resampled.index)
@@ -177,4 +509,8 @@ class BacktestEngine:
         ax2.grid(True, alpha=0.3)
 
         plt.tight_layout()
+        if path is not None:
+            fig.savefig(path)
+            plt.close(fig)
+            return path
         plt.show()
\ No newline at end of file
@@ -0,0 +1,399 @@
+import os
+import json
+import shutil
+import hashlib
+import numpy as np
+import pandas as pd
+from data_loader import parse_timestamps
+
+class BarStore:
+    """
+    增量K線存儲 (每個欄位一個只追加的 .bin 檔 + int64 epoch 索引 + meta.json)
+    - append 把時間晚於已存最後一根的行直接追加到檔尾；只有亂序到達的舊時間行才重寫插入點之後的尾部
+    - 缺失的K線 (gap) 與重複時間戳在攝入時建立索引，之後查詢不用重新掃描
+    - 時間範圍查詢在已排序的 epoch 索引上二分查找 (O(log n))，只從磁碟讀取該區間的行 (memmap)
+    清洗規則與 DataLoader.load_data 相同 (去空值、重複時間戳只保留第一筆，亂序行保留)；
+    load_data 保持文件中的行序，存儲則按時間排序，所以文件按時間排序時兩者逐行相同，否則是相同的行、排序後的順序
+    """
+    VERSION = 1
+    TAIL_BLOCK = 4096 # 增量讀 CSV 時，用上次讀到位置之前的這段內容確認文件只是被追加
+
+    def __init__(self, directory, interval='1min'):
+        self.directory = directory
+        self.interval = interval
+        self.step_ns = pd.Timedelta(interval).value
+        self.meta = self._read_meta()
+        if self.meta:
+            if self.meta.get('version') != self.VERSION or self.meta.get('interval') != interval:
+                raise ValueError(f"BarStore {directory} has version/interval "
+                                 f"{self.meta.get('version')}/{self.meta.get('interval')}, expected {self.VERSION}/{interval}")
+            if 'journal' in self.meta:
+                self._apply_journal()
+            self._recover()
+
+    def __len__(self):
+        return self.meta['rows'] if self.meta else 0
+
+    @property
+    def columns(self):
+        return list(self.meta['columns']) if self.meta else []
+
+    @property
+    def last_timestamp(self):
+        """已存最後一根K線的時間 (空存儲返回 None)"""
+        last = self._last_epoch()
+        return None if last is None else pd.Timestamp(last, unit='ns')
+
+    # ==========================================
+    # 寫入
+    # ==========================================
+
+    def append(self, df):
+        """
+        追加K線 (索引為 DatetimeIndex，欄位須為數值型且與已存欄位相同)
+        時間晚於已存最後一根的行直接追加；亂序到達、早於最後一根的行不丟棄，
+        從插入位置起重寫尾部 (見 _rewrite_tail)，存儲始終按時間排序
+        返回攝入報告：rows / appended (新存入的行) / nan /
+                      duplicates (時間戳已存在但值不同，保留先到的一筆，記錄到重複索引) /
+                      existing (與已存的行完全相同，例如文件被改寫後重讀) / out_of_order (插入到最後一根之前的行) /
+                      gaps / missing_bars (缺口數與缺失K線數的變化)
+        """
+        report = {'rows': len(df), 'appended': 0, 'nan': 0, 'duplicates': 0, 'existing': 0, 'out_of_order': 0,
+                  'gaps': 0, 'missing_bars': 0}
+        if len(df) == 0:
+            return report
+        if not self.meta:
+            self._create(df)
+        if list(df.columns) != self.meta['columns']:
+            raise ValueError(f"Columns {list(df.columns)} do not match stored columns {self.meta['columns']}")
+
+        # 清除空值
+        valid = df.notna().all(axis=1).to_numpy()
+        report['nan'] = int((~valid).sum())
+        epoch = df.index.values.astype('datetime64[ns]').view('int64')[valid]
+        values = [df[col].to_numpy()[valid].astype(dtype, copy=False) for col, dtype in zip(df.columns, self.meta['dtypes'])]
+
+        # 亂序時穩定排序 (同一時間戳仍保留原先的第一筆)
+        if len(epoch) > 1 and (np.diff(epoch) < 0).any():
+            order = np.argsort(epoch, kind='stable')
+            epoch = epoch[order]
+            values = [v[order] for v in values]
+
+        # 批內重複時間戳：只保留第一筆
+        first = np.ones(len(epoch), dtype=bool)
+        first[1:] = epoch[1:] != epoch[:-1]
+        duplicates = [epoch[~first]]
+        epoch, values = epoch[first], [v[first] for v in values]
+
+        # 時間戳已存在：值相同的是重讀的舊行，值不同的是重複 (已存的一筆先到，保留它)
+        index = self._index()
+        if len(index) and len(epoch) and epoch[0] <= index[-1]:
+            at = np.searchsorted(index, epoch)
+            found = at < len(index)
+            found[found] = index[at[found]] == epoch[found]
+            if found.any():
+                same = np.ones(int(found.sum()), dtype=bool)
+                for i, v in enumerate(values):
+                    same &= self._column(i)[at[found]] == v[found]
+                report['existing'] = int(same.sum())
+                duplicates.append(epoch[found][~same])
+                epoch, values = epoch[~found], [v[~found] for v in values]
+        dup_epoch = np.sort(np.concatenate(duplicates))
+        report['duplicates'] = len(dup_epoch)
+        report['appended'] = len(epoch)
+
+        # 插入位置：全部晚於最後一根時就是末尾 (純追加)
+        pos = int(np.searchsorted(index, epoch[0])) if len(epoch) and len(index) else len(index)
+        if pos < len(index):
+            report['out_of_order'] = int((epoch < index[-1]).sum())
+            merged = np.concatenate((index[pos:], epoch))
+            order = np.argsort(merged, kind='stable')
+            epoch = merged[order]
+            values = [np.concatenate((self._column(i)[pos:], v))[order] for i, v in enumerate(values)]
+        del index
+
+        # 缺口：相鄰兩根間隔超過一個週期 (記錄缺口前後兩根的時間)
+        prev = int(self._index()[pos - 1]) if pos > 0 else None
+        gap_pairs = np.empty((0, 2), dtype=np.int64)
+        missing = 0
+        if len(epoch):
+            bounds = np.concatenate(([prev], epoch)) if prev is not None else epoch
+            step = np.diff(bounds)
+            at = np.flatnonzero(step > self.step_ns)
+            gap_pairs = np.column_stack((bounds[at], bounds[at + 1]))
+            missing = int(((step[at] - 1) // self.step_ns).sum())
+
+        if pos < len(self):
+            # 重寫尾部：插入點之後的舊缺口作廢，由 gap_pairs 重新計算
+            pairs = self._gap_pairs()
+            gap_pos = int(np.searchsorted(pairs[:, 1], prev, side='right')) if prev is not None else 0
+            removed = pairs[gap_pos:]
+            removed_missing = int(((removed[:, 1] - removed[:, 0] - 1) // self.step_ns).sum())
+            report['gaps'] = len(gap_pairs) - len(removed)
+            report['missing_bars'] = missing - removed_missing
+            self._rewrite_tail(pos, gap_pos, epoch, values, gap_pairs, dup_epoch,
+                               self.meta['missing_bars'] + report['missing_bars'])
+            return report
+
+        # 純追加：先寫數據再寫 meta，中斷時 meta 中的行數仍是舊值，下次打開時截掉多寫的部分
+        report['gaps'] = len(gap_pairs)
+        report['missing_bars'] = missing
+        for i, v in enumerate(values):
+            self._write(f'col_{i}.bin', v)
+        self._write('index.bin', epoch)
+        self._write('gaps.bin', gap_pairs)
+        self._write('duplicates.bin', dup_epoch)
+
+        self.meta['rows'] += len(epoch)
+        self.meta['gaps'] += len(gap_pairs)
+        self.meta['duplicates'] += len(dup_epoch)
+        self.meta['missing_bars'] += missing
+        self._write_meta()
+        return report
+
+    def ingest_csv(self, filepath, chunksize=1_000_000):
+        """
+        把 CSV 中新增的行追加進存儲 (CSV 格式與 DataLoader 相同)
+        記住上次讀到的位元組位置；文件只是被追加時從該位置繼續解析，不重讀舊內容，
+        上次位置之前的內容變了 (文件被截短或重寫) 則從頭解析 (與已存完全相同的行計入 existing，不重複寫入)
+        寫入中、尚未換行的最後一行留到下次再讀
+        """
+        key = os.path.abspath(filepath)
+        source = self.meta.get('sources', {}).get(key) if self.meta else None
+        total = {'rows': 0, 'appended': 0, 'nan': 0, 'duplicates': 0, 'existing': 0, 'out_of_order': 0,
+                 'gaps': 0, 'missing_bars': 0}
+
+        with open(filepath, 'rb') as f:
+            header = f.readline()
+            start = len(header)
+            if source and source['header'] == header.decode() and self._tail_digest(f, source['offset']) == source['digest']:
+                start = source['offset']
+            end = max(self._line_end(f, os.fstat(f.fileno()).st_size), start)
+
+            if end > start:
+                names = pd.read_csv(filepath, nrows=0).columns
+                f.seek(start)
+                for chunk in pd.read_csv(_BoundedReader(f, end - start), names=names, header=None, chunksize=chunksize):
+                    report = self.append(parse_timestamps(chunk))
+                    for k in total:
+                        total[k] += report[k]
+            digest = self._tail_digest(f, end)
+
+        if self.meta:
+            self.meta.setdefault('sources', {})[key] = {'header': header.decode(), 'offset': end, 'digest': digest}
+            self._write_meta()
+        print(f"Ingested {filepath}: {total['appended']} new rows (read {total['rows']}, {total['duplicates']} duplicates, "
+              f"{total['existing']} existing, {total['out_of_order']} out of order, {total['nan']} NaN, "
+              f"{total['gaps']} gaps / {total['missing_bars']} missing bars)")
+        return total
+
+    # ==========================================
+    # 讀取
+    # ==========================================
+
+    def range_indices(self, start=None, end=None):
+        """[start, end) 對應的行號區間 (lo, hi)，在 epoch 索引上二分查找"""
+        index = self._index()
+        lo = 0 if start is None else int(np.searchsorted(index, _to_epoch(start), side='left'))
+        hi = len(index) if end is None else int(np.searchsorted(index, _to_epoch(end), side='left'))
+        return lo, max(lo, hi)
+
+    def load(self, start=None, end=None):
+        """
+        讀取 [start, end) 的K線 (start / end 可為 None、字串或 Timestamp)
+        欄位是 memmap 切片 (寫入時複製)，只有該區間的頁面會從磁碟讀入
+        """
+        if not self.meta:
+            return pd.DataFrame(index=pd.DatetimeIndex([], name='datetime'))
+        lo, hi = self.range_indices(start, end)
+        index = pd.DatetimeIndex(self._index()[lo:hi].view('datetime64[ns]'), name=self.meta['index_name'])
+        if str(index.dtype) != self.meta['index_dtype']:
+            index = index.astype(self.meta['index_dtype'])
+        columns = {col: self._column(i)[lo:hi] for i, col in enumerate(self.meta['columns'])}
+        return pd.DataFrame(columns, index=index, copy=False)
+
+    def gaps(self, start=None, end=None):
+        """
+        攝入時記錄的缺口：before = 缺口前最後一根，after = 缺口後第一根，missing = 缺失的K線數
+        只返回 after 落在 [start, end) 的缺口
+        """
+        pairs = self._gap_pairs()
+        lo = 0 if start is None else int(np.searchsorted(pairs[:, 1], _to_epoch(start), side='left'))
+        hi = len(pairs) if end is None else int(np.searchsorted(pairs[:, 1], _to_epoch(end), side='left'))
+        pairs = pairs[lo:max(lo, hi)]
+        return pd.DataFrame({
+            'before': pairs[:, 0].view('datetime64[ns]'),
+            'after': pairs[:, 1].view('datetime64[ns]'),
+            'missing': (pairs[:, 1] - pairs[:, 0] - 1) // self.step_ns,
+        })
+
+    def duplicates(self):
+        """攝入時丟棄的重複時間戳 (每丟棄一行記錄一次)"""
+        epoch = self._array('duplicates.bin', np.int64, self.meta['duplicates'] if self.meta else 0)
+        return pd.DatetimeIndex(epoch.view('datetime64[ns]'))
+
+    def summary(self):
+        """行數、時間範圍與缺口 / 重複統計"""
+        if not self.meta:
+            return {'rows': 0}
+        index = self._index()
+        return {'rows': len(index), 'first': str(pd.Timestamp(index[0], unit='ns')), 'last': str(self.last_timestamp),
+                'gaps': self.meta['gaps'], 'missing_bars': self.meta['missing_bars'], 'duplicates': self.meta['duplicates']}
+
+    # ==========================================
+    # 內部工具
+    # ==========================================
+
+    def _path(self, name):
+        return os.path.join(self.directory, name)
+
+    def _read_meta(self):
+        try:
+            with open(self._path('meta.json'), 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _write_meta(self):
+        """寫到臨時檔再替換，meta.json 不會只寫一半"""
+        tmp = self._path('meta.json.tmp')
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(self.meta, f, indent=2)
+        os.replace(tmp, self._path('meta.json'))
+
+    def _create(self, df):
+        non_numeric = [c for c in df.columns if not pd.api.types.is_numeric_dtype(df[c])]
+        if non_numeric:
+            raise ValueError(f"BarStore only stores numeric columns, got {non_numeric}")
+        os.makedirs(self.directory, exist_ok=True)
+        self.meta = {'version': self.VERSION, 'interval': self.interval, 'columns': list(df.columns),
+                     'dtypes': [str(df[c].dtype) for c in df.columns], 'index_name': df.index.name or 'datetime',
+                     'index_dtype': 'datetime64[ns]', 'rows': 0, 'gaps': 0, 'missing_bars': 0, 'duplicates': 0,
+                     'sources': {}}
+        if isinstance(df.index, pd.DatetimeIndex) and df.index.tz is None:
+            self.meta['index_dtype'] = str(df.index.dtype)
+        for name in self._files():
+            open(self._path(name), 'wb').close()
+        self._write_meta()
+
+    def _files(self):
+        """每個檔案及其在 meta 記錄的行數下應有的位元組數"""
+        rows = self.meta['rows']
+        sizes = {f'col_{i}.bin': rows * np.dtype(dtype).itemsize for i, dtype in enumerate(self.meta['dtypes'])}
+        sizes.update({'index.bin': rows * 8, 'gaps.bin': self.meta['gaps'] * 16,
+                      'duplicates.bin': self.meta['duplicates'] * 8})
+        return sizes
+
+    def _recover(self):
+        """上次追加在寫 meta 前中斷時，截掉多寫的部分；刪除未登記的重寫臨時檔"""
+        for name, size in self._files().items():
+            path = self._path(name)
+            if os.path.getsize(path) > size:
+                os.truncate(path, size)
+            if os.path.exists(f"{path}.new"):
+                os.remove(f"{path}.new")
+
+    def _rewrite_tail(self, pos, gap_pos, epoch, values, gap_pairs, dup_epoch, missing_bars):
+        """
+        亂序行插入：第 pos 行 (及第 gap_pos 個缺口) 起的尾部換成新內容
+        每個檔案寫成 <name>.new (前段照抄 + 新尾部)，meta 記錄 journal 後再逐個替換；
+        替換中途中斷時，下次打開存儲會完成剩下的替換 (見 _apply_journal)
+        用替換而不是原地截斷，之前 load 返回的 memmap 仍指向舊檔案，不會失效
+        代價是重寫整個檔案，只在有亂序行時發生
+        """
+        tails = {f'col_{i}.bin': v for i, v in enumerate(values)}
+        tails.update({'index.bin': epoch, 'gaps.bin': gap_pairs})
+        keep = {name: pos * np.dtype(dtype).itemsize for name, dtype in
+                zip((f'col_{i}.bin' for i in range(len(values))), self.meta['dtypes'])}
+        keep.update({'index.bin': pos * 8, 'gaps.bin': gap_pos * 16})
+
+        for name, tail in tails.items():
+            with open(self._path(name), 'rb') as src, open(self._path(f"{name}.new"), 'wb') as dst:
+                shutil.copyfileobj(_BoundedReader(src, keep[name]), dst)
+                dst.write(np.ascontiguousarray(tail).tobytes())
+        self._write('duplicates.bin', dup_epoch)
+
+        self.meta['duplicates'] += len(dup_epoch)
+        self.meta['journal'] = {'rows': pos + len(epoch), 'gaps': gap_pos + len(gap_pairs), 'missing_bars': missing_bars,
+                                'files': list(tails)}
+        self._write_meta()
+        self._apply_journal()
+
+    def _apply_journal(self):
+        """完成 _rewrite_tail 登記的檔案替換並更新行數 (可重複執行)"""
+        job = self.meta['journal']
+        for name in job['files']:
+            if os.path.exists(self._path(f"{name}.new")):
+                os.replace(self._path(f"{name}.new"), self._path(name))
+        self.meta.update(rows=job['rows'], gaps=job['gaps'], missing_bars=job['missing_bars'])
+        del self.meta['journal']
+        self._write_meta()
+
+    def _gap_pairs(self):
+        return self._array('gaps.bin', np.int64, self.meta['gaps'] * 2 if self.meta else 0).reshape(-1, 2)
+
+    def _write(self, name, values):
+        with open(self._path(name), 'ab') as f:
+            f.write(np.ascontiguousarray(values).tobytes())
+
+    def _array(self, name, dtype, count):
+        # mode='c': 寫入時複製，不會改動磁碟上的數據 (與 DataLoader 快取相同)；空檔案不能 memmap
+        if count == 0:
+            return np.empty(0, dtype=dtype)
+        return np.memmap(self._path(name), dtype=dtype, mode='c', shape=(count,))
+
+    def _index(self):
+        return self._array('index.bin', np.int64, len(self))
+
+    def _column(self, i):
+        return self._array(f'col_{i}.bin', self.meta['dtypes'][i], len(self))
+
+    def _last_epoch(self):
+        return int(self._index()[-1]) if len(self) else None
+
+    def _tail_digest(self, f, offset):
+        """offset 之前 TAIL_BLOCK 位元組的雜湊 (offset 超過文件大小時返回 None)"""
+        if offset > os.fstat(f.fileno()).st_size:
+            return None
+        f.seek(max(offset - self.TAIL_BLOCK, 0))
+        return hashlib.sha1(f.read(offset - max(offset - self.TAIL_BLOCK, 0))).hexdigest()
+
+    @staticmethod
+    def _line_end(f, size, block=1 << 16):
+        """最後一個換行符之後的位置 (只讀取完整的行)"""
+        pos = size
+        while pos > 0:
+            start = max(pos - block, 0)
+            f.seek(start)
+            data = f.read(pos - start)
+            at = data.rfind(b'\n')
+            if at >= 0:
+                return start + at + 1
+            pos = start
+        return 0
+
+class _BoundedReader:
+    """只讀到 limit 位元組的文件包裝，供 pd.read_csv 分塊解析文件的一段"""
+    def __init__(self, f, limit):
+        self.f = f
+        self.remaining = limit
+
+    def read(self, size=-1):
+        if size is None or size < 0 or size > self.remaining:
+            size = self.remaining
+        data = self.f.read(size)
+        self.remaining -= len(data)
+        return data
+
+    def readline(self, size=-1):
+        if size is None or size < 0 or size > self.remaining:
+            size = self.remaining
+        data = self.f.readline(size)
+        self.remaining -= len(data)
+        return data
+
+    def __iter__(self):
+        return iter(self.readline, b'')
+
+def _to_epoch(value):
+    return pd.Timestamp(value).as_unit('ns').value
\ No newline at end of file
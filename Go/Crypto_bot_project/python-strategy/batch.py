@@ -0,0 +1,246 @@
+import time
+from bisect import bisect_left
+
+import numpy as np
+import pandas as pd
+
+from strategy import StrategySMA_ATR, price_fingerprint, price_frame
+from indicators import DEFAULT_CACHE, sma, atr
+from metrics import TradeRecorder, compute_metrics
+
+class BatchBacktestEngine:
+    """
+    StrategySMA_ATR 多組參數的批量回測：一次遍歷數據，同時推進 K 個變體
+    - 指標按「不重複的週期」各計算一次 (K 個變體共用)，不為每個變體複製 DataFrame
+    - 每個變體的進出場信號預先轉成稀疏的K線索引
+    - 持倉狀態是長度 K 的向量 (資金/倉位/止損/止盈...)；每一步取所有變體中最早的事件K線，
+      只處理在該K線有事件的變體，其餘變體的權益在下一次狀態改變時整段填充
+    每個變體是獨立帳戶，結果與逐組 BacktestEngine.run_fast 完全一致 (close 模式)
+    注意：這不是逐根K線推進 (bars x variants) 二維狀態矩陣的做法。狀態向量按變體存放，
+    但只在事件K線 (進場/出場) 上逐個變體更新，空倉與持倉區段整段跳過；
+    交叉信號稀疏時，這比每根K線更新 K 個狀態少做幾個數量級的工作，
+    也能與 run_fast 的事件循環逐筆一致。速度比較見 benchmarks/bench_batch.py
+    """
+    def __init__(self, initial_balance=10000, fee_rate=0.001, indicator_cache=None):
+        self.initial_balance = initial_balance
+        self.fee_rate = fee_rate
+        self.indicator_cache = indicator_cache or DEFAULT_CACHE
+        self.param_sets = []
+        self.equity_curve = None
+        self.trades = []
+        self.metrics = []
+        self.throughput = None
+
+    def run(self, df, param_sets, keep_equity=True):
+        """
+        param_sets: StrategySMA_ATR 的參數 dict 列表 (fast/slow/atr 週期、risk_per_trade、sl/tp ATR 倍數)
+        返回 (T, K) 權益曲線 DataFrame (欄位為變體編號，預熱期為 NaN)；keep_equity=False 時只保留績效指標，返回 None
+        事件循環只記錄每個變體的權益區段 (每筆交易兩段)，結束後才逐行填充；
+        keep_equity=False 時不分配 K x T 矩陣，所有變體輪流使用同一行長度 T 的緩衝
+        """
+        self.param_sets = [dict(p) for p in param_sets]
+        strategies = [StrategySMA_ATR(indicator_cache=self.indicator_cache, **p) for p in self.param_sets]
+        K, T = len(strategies), len(df)
+
+        # 只還原指標與記帳需要的欄位 (float32 價格按數據快取，見 price_frame)
+        fingerprint = price_fingerprint(df)
+        cache = self.indicator_cache
+        base = price_frame(df, ('High', 'Low', 'Close'), cache=cache, fingerprint=fingerprint)
+        close = base['Close'].to_numpy(dtype=np.float64)
+        index = df.index
+        epoch = index.values.astype('datetime64[ns]').view('int64')
+
+        print(f"--- Running Batch Backtest on {T} bars x {K} variants ---")
+        start_time = time.perf_counter()
+
+        # 1. 指標：每個不重複的週期只計算一次
+        windows = {w for s in strategies for w in (s.fast_period, s.slow_period)}
+        sma_values = {w: sma(base, w, cache=cache, fingerprint=fingerprint) for w in windows}
+        atr_values = {p: atr(base, p, cache=cache, fingerprint=fingerprint) for p in {s.atr_period for s in strategies}}
+
+        # 2. 每個變體的稀疏信號 (金叉/死叉只依賴快慢線組合，相同組合共用)
+        crossings = {}
+        start = np.empty(K, dtype=np.int64) # 指標預熱完成的第一根 (對應 prepare_indicators 的 dropna)
+        entry_idx, exit_idx = [], []
+        for k, s in enumerate(strategies):
+            fast, slow, atr_k = sma_values[s.fast_period], sma_values[s.slow_period], atr_values[s.atr_period]
+            valid = ~(np.isnan(fast) | np.isnan(slow) | np.isnan(atr_k) | np.isnan(close))
+            first = int(valid.argmax()) if valid.any() else T
+            if not valid[first:].all():
+                raise ValueError("BatchBacktestEngine requires data without NaN after the indicator warmup")
+            start[k] = first
+
+            pair = (s.fast_period, s.slow_period)
+            if pair not in crossings:
+                with np.errstate(invalid='ignore'):
+                    golden = np.flatnonzero((fast[:-1] < slow[:-1]) & (fast[1:] > slow[1:])) + 1
+                    death = np.flatnonzero((fast[:-1] > slow[:-1]) & (fast[1:] < slow[1:])) + 1
+                crossings[pair] = (golden, death)
+            golden, death = crossings[pair]
+            # 預熱後的第一根只記錄權益，不交易 (與 run_fast 的 trade_from=1 相同)
+            entry_idx.append(golden[golden >= first + 1])
+            # 出場索引轉成 list：事件循環中逐個查找時 bisect 比 np.searchsorted 的標量調用快得多
+            exit_idx.append(death[death >= first + 1].tolist())
+
+        # 3. 向量化的持倉狀態
+        balance = np.full(K, float(self.initial_balance))
+        held = np.zeros(K, dtype=bool)
+        size = np.zeros(K, dtype=np.float64)
+        entry_price = np.zeros(K, dtype=np.float64)
+        entry_bar = np.zeros(K, dtype=np.int64)
+        stop_loss = np.zeros(K, dtype=np.float64)
+        take_profit = np.zeros(K, dtype=np.float64)
+        seg_start = start.copy() # 每個變體權益曲線待填充區段的起點
+        pending = np.zeros(K, dtype=np.float64) # 空倉變體下一次可成交進場的倉位
+        fee_rate = self.fee_rate
+
+        def next_entry(k, begin):
+            """
+            從 begin 起第一根資金足以成交的進場信號，返回 (K線, 倉位)
+            空倉期間資金不變，所以可以把後續所有進場信號的倉位與資金檢查整批向量化計算
+            """
+            entries, s = entry_idx[k], strategies[k]
+            atr_k = atr_values[s.atr_period]
+            pos = bisect_left(entries, begin)
+            if pos >= len(entries):
+                return T, 0.0
+
+            # 大多數信號第一次就能成交，先用標量檢查避免小陣列的開銷
+            j = int(entries[pos])
+            price = float(close[j])
+            qty = s.position_size(float(balance[k]), price, float(s.sl_atr_mult * atr_k[j]), fee_rate)
+            cost = qty * price
+            if qty > 0 and balance[k] >= cost + cost * fee_rate:
+                return j, qty
+
+            pos, chunk = pos + 1, 16
+            while pos < len(entries):
+                cand = entries[pos:pos + chunk]
+                prices = close[cand]
+                qty = s.position_sizes(balance[k], prices, s.sl_atr_mult * atr_k[cand], fee_rate)
+                cost = qty * prices
+                ok = (qty > 0) & (balance[k] >= cost + cost * fee_rate)
+                if ok.any():
+                    f = int(ok.argmax())
+                    return int(cand[f]), float(qty[f])
+                pos += chunk
+                chunk *= 2
+            return T, 0.0
+
+        nxt = np.full(K, T, dtype=np.int64)
+        for k in range(K):
+            nxt[k], pending[k] = next_entry(k, start[k] + 1)
+
+        segments = [[] for _ in range(K)] # 每個變體的權益區段 (start, end, balance, size)
+        self.trades = [TradeRecorder() for _ in range(K)]
+
+        while True:
+            j = int(nxt.min()) if K else T
+            if j >= T: break
+            price = float(close[j])
+
+            for k in np.flatnonzero(nxt == j):
+                if held[k]:
+                    # --- 出場 (死叉或觸及止損/止盈，都以收盤價成交) ---
+                    # 出場K線的權益以持倉狀態計算
+                    segments[k].append((seg_start[k], j + 1, float(balance[k]), float(size[k])))
+                    seg_start[k] = j + 1
+
+                    revenue = size[k] * price
+                    fee = revenue * fee_rate
+                    balance[k] += (revenue - fee)
+                    pnl = (revenue - fee) - (entry_price[k] * size[k] * (1 + fee_rate))
+                    self.trades[k].append(int(epoch[entry_bar[k]]), int(epoch[j]), float(entry_price[k]), price,
+                                          float(size[k]), float(pnl))
+                    held[k] = False
+                    size[k] = 0.0
+                    nxt[k], pending[k] = next_entry(k, j + 1)
+                else:
+                    # --- 進場 (next_entry 已確認倉位 > 0 且資金足夠) ---
+                    s = strategies[k]
+                    atr_j = atr_values[s.atr_period][j]
+                    qty = float(pending[k])
+                    cost = qty * price
+                    fee = cost * fee_rate
+
+                    # 進場K線的權益仍以進場前狀態計算
+                    segments[k].append((seg_start[k], j + 1, float(balance[k]), 0.0))
+                    seg_start[k] = j + 1
+
+                    balance[k] -= (cost + fee)
+                    held[k] = True
+                    size[k] = qty
+                    entry_price[k] = price
+                    entry_bar[k] = j
+                    stop_loss[k] = price - float(s.sl_atr_mult * atr_j)
+                    take_profit[k] = price + float(s.tp_atr_mult * atr_j)
+                    nxt[k] = self._next_exit(close, exit_idx[k], j + 1, stop_loss[k], take_profit[k], T)
+
+        # 4. 逐個變體填充權益 (預熱期為 NaN)，並計算績效
+        equity = np.empty((K, T), dtype=np.float64) if keep_equity else None # 每個變體一行，整段填充時是連續記憶體
+        buffer = None if keep_equity else np.empty(T, dtype=np.float64)
+        self.metrics = []
+        for k in range(K):
+            row = equity[k] if keep_equity else buffer
+            segments[k].append((seg_start[k], T, float(balance[k]), float(size[k]) if held[k] else 0.0))
+            for seg in segments[k]:
+                self._fill(row, close, *seg)
+            segments[k] = None
+            row[:start[k]] = np.nan
+            self.metrics.append(self._performance(k, row[start[k]:], epoch[start[k]:],
+                                                  entry_bar[k] if held[k] else None, epoch))
+
+        elapsed = time.perf_counter() - start_time
+        self.throughput = T * K / elapsed if elapsed > 0 else float('inf')
+        print(f"Throughput: {self.throughput:,.0f} bar-variants/sec ({elapsed:.2f}s)")
+
+        if not keep_equity:
+            self.equity_curve = None
+            return None
+        self.equity_curve = pd.DataFrame(equity.T, index=index, columns=range(K), copy=False)
+        return self.equity_curve
+
+    def _fill(self, row, close, start, end, balance, size):
+        """權益 (與 Account.equity 相同算式)：空倉為現金，持倉為現金 + 市值 - 預估平倉手續費"""
+        if start >= end:
+            return
+        if size == 0:
+            row[start:end] = balance
+            return
+        mkt_value = size * close[start:end]
+        row[start:end] = balance + mkt_value - mkt_value * self.fee_rate
+
+    @staticmethod
+    def _next_exit(close, exits, start, stop_loss, take_profit, T, block=1024):
+        """下一根出場信號與 [start, 出場信號) 之間第一根觸及 SL/TP 的K線中較早者"""
+        pos = bisect_left(exits, start)
+        limit = exits[pos] if pos < len(exits) else T
+        while start < limit:
+            end = min(start + block, limit)
+            window = close[start:end]
+            hit = (window <= stop_loss) | (window >= take_profit)
+            first = int(hit.argmax())
+            if hit[first]:
+                return start + first
+            start = end
+            block *= 2
+        return limit
+
+    def _performance(self, k, equity, times, open_bar, epoch):
+        trades = self.trades[k].array
+        if open_bar is not None:
+            # 仍持倉的部分也計入持倉比例
+            open_trade = np.zeros(1, dtype=trades.dtype)
+            open_trade['entry_time'] = epoch[open_bar]
+            open_trade['exit_time'] = times[-1]
+            trades = np.concatenate([trades, open_trade])
+        if len(equity) == 0:
+            return compute_metrics([], self.trades[k].pnl, self.initial_balance)
+        return compute_metrics(equity, self.trades[k].pnl, self.initial_balance, times=times, trades=trades)
+
+    def results(self, rank_by='total_return', ascending=False):
+        """每個變體一行：參數 + 績效指標，按 rank_by 排序 (格式與 ParameterSweep.run 相同)"""
+        table = pd.DataFrame([dict(params, **metrics) for params, metrics in zip(self.param_sets, self.metrics)])
+        if table.empty or rank_by is None:
+            return table
+        return table.sort_values(rank_by, ascending=ascending).reset_index(drop=True)
\ No newline at end of file
@@ -0,0 +1,122 @@
+"""
+批量回測 (batch.BatchBacktestEngine) 與逐組 BacktestEngine.run_fast 的速度比較與結果驗證
+
+用法:
+    python benchmarks/bench_batch.py --bars 1e6
+    python benchmarks/bench_batch.py --csv btcusd_1-min_data.csv --repeat 3
+
+同一組參數網格分別用：
+- batch: 一次遍歷數據推進所有變體
+- separate: 每組參數一個 run_fast，每次使用新的 IndicatorCache (等同 N 次獨立回測)
+- separate_shared: 每組參數一個 run_fast，共用一個 IndicatorCache (指標只計算一次，只比較狀態循環)
+每種方式取 repeat 次中最快的一次；並逐變體檢查權益曲線、交易記錄與績效指標完全一致
+"""
+import io
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+import contextlib
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(HERE)
+sys.path[:0] = [ROOT, os.path.join(ROOT, 'strategies'), HERE]
+
+import numpy as np
+
+from synthetic import write_csv
+from data_loader import DataLoader
+from strategy import StrategySMA_ATR
+from backtester import BacktestEngine
+from batch import BatchBacktestEngine
+from optimizer import ParameterSweep
+from indicators import IndicatorCache
+
+def run_batch(df, param_sets):
+    engine = BatchBacktestEngine(indicator_cache=IndicatorCache())
+    with contextlib.redirect_stdout(io.StringIO()):
+        equity = engine.run(df, param_sets)
+    return engine, equity
+
+def run_separate(df, param_sets, shared_cache):
+    cache = IndicatorCache() if shared_cache else None
+    results = []
+    for params in param_sets:
+        strategy = StrategySMA_ATR(indicator_cache=cache or IndicatorCache(), **params)
+        engine = BacktestEngine()
+        with contextlib.redirect_stdout(io.StringIO()):
+            curve = engine.run_fast(df, strategy)
+        results.append((engine, curve['equity']))
+    return results
+
+def best_of(repeat, fn, *args):
+    """repeat 次中最快的耗時，以及最後一次的結果"""
+    best, result = float('inf'), None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn(*args)
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+def validate(batch, batch_equity, separate):
+    """逐變體比較權益曲線 (預熱期以外)、交易記錄與績效指標"""
+    mismatches = []
+    for k, (engine, equity) in enumerate(separate):
+        column = batch_equity[k].dropna()
+        same = (column.index.equals(equity.index) and np.array_equal(column.to_numpy(), equity.to_numpy())
+                and np.array_equal(batch.trades[k].array, engine.trades.array)
+                and batch.metrics[k] == engine.performance())
+        if not same:
+            mismatches.append(k)
+    return mismatches
+
+def main():
+    parser = argparse.ArgumentParser(description='Batch backtest vs. separate run_fast calls')
+    parser.add_argument('--bars', type=float, default=1e6, help='synthetic bars (ignored with --csv)')
+    parser.add_argument('--csv', default=None, help='use an existing CSV instead of synthetic data')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--repeat', type=int, default=1)
+    parser.add_argument('--workdir', default=None)
+    parser.add_argument('--output', default=None, help='write the report as JSON')
+    args = parser.parse_args()
+
+    csv_path = args.csv
+    if csv_path is None:
+        workdir = args.workdir or os.path.join(tempfile.gettempdir(), 'crypto_bench')
+        os.makedirs(workdir, exist_ok=True)
+        csv_path = os.path.join(workdir, f'synthetic_{int(args.bars)}_{args.seed}.csv')
+        if not os.path.exists(csv_path):
+            write_csv(csv_path, int(args.bars), seed=args.seed)
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        df = DataLoader(csv_path).load_data()
+    param_sets = ParameterSweep.grid([5, 10, 20], [30, 50], [7, 14], [0.02, 0.03])
+    param_sets.append(dict(fast_period=10, slow_period=50, atr_period=14, sl_atr_mult=1.5, tp_atr_mult=4.0))
+
+    batch_time, (batch, batch_equity) = best_of(args.repeat, run_batch, df, param_sets)
+    separate_time, separate = best_of(args.repeat, run_separate, df, param_sets, False)
+    shared_time, _ = best_of(args.repeat, run_separate, df, param_sets, True)
+    mismatches = validate(batch, batch_equity, separate)
+
+    report = {'csv': csv_path, 'bars': len(df), 'variants': len(param_sets),
+              'batch_s': batch_time, 'separate_s': separate_time, 'separate_shared_s': shared_time,
+              'speedup': separate_time / batch_time, 'speedup_shared': shared_time / batch_time,
+              'mismatches': mismatches}
+
+    print(f"\n{len(df)} bars x {len(param_sets)} variants (best of {args.repeat})")
+    print(f"{'mode':<18} {'seconds':>9} {'speedup':>8}")
+    print(f"{'batch':<18} {batch_time:>9.2f} {1.0:>8.2f}")
+    print(f"{'separate':<18} {separate_time:>9.2f} {report['speedup']:>8.2f}")
+    print(f"{'separate_shared':<18} {shared_time:>9.2f} {report['speedup_shared']:>8.2f}")
+    print(f"\nExact match with run_fast: {'PASS' if not mismatches else f'FAIL {mismatches}'}")
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+        print(f"Report written to {args.output}")
+    return 0 if not mismatches else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
\ No newline at end of file
@@ -0,0 +1,118 @@
+"""
+省記憶體模式 (DataLoader(lean=True) + StrategySMA_ATR(lean=True)) 的記憶體報告與結果驗證
+
+用法:
+    python benchmarks/bench_lean.py --bars 1e6
+    python benchmarks/bench_lean.py --csv btcusd_1-min_data.csv --rtol 0.01
+
+對 float64 (原始) 與 lean 兩種模式分別跑 load_data -> split_data -> prepare_indicators -> run_fast，
+記錄數據本身的大小與 tracemalloc 峰值，並檢查 lean 模式的績效指標與 float64 的相對誤差在 rtol 以內
+"""
+import io
+import os
+import sys
+import json
+import argparse
+import tempfile
+import contextlib
+import tracemalloc
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(HERE)
+sys.path[:0] = [ROOT, os.path.join(ROOT, 'strategies'), HERE]
+
+import numpy as np
+
+from synthetic import write_csv
+from data_loader import DataLoader
+from strategy import StrategySMA_ATR
+from backtester import BacktestEngine
+from indicators import IndicatorCache
+
+# 驗證時比較的指標
+CHECK_METRICS = ('final_equity', 'total_return', 'max_drawdown', 'win_rate', 'trades')
+
+def run_mode(csv_path, lean):
+    """單一模式的完整流水線，返回記憶體統計、績效與權益曲線"""
+    tracemalloc.start()
+    with contextlib.redirect_stdout(io.StringIO()):
+        loader = DataLoader(csv_path, lean=lean)
+        df = loader.load_data(use_cache=False)
+        data_mb = df.memory_usage(index=True, deep=True).sum() / 1024 / 1024
+        test_set, validation_set = loader.split_data()
+
+        strategy = StrategySMA_ATR(indicator_cache=IndicatorCache(), lean=lean)
+        prepared = strategy.prepare_indicators(test_set)
+        prepared_mb = prepared.memory_usage(index=True, deep=True).sum() / 1024 / 1024
+        del prepared
+
+        engine = BacktestEngine()
+        curve = engine.run_fast(test_set, strategy)
+    peak_mb = tracemalloc.get_traced_memory()[1] / 1024 / 1024
+    tracemalloc.stop()
+
+    return {
+        'lean': lean,
+        'float32_columns': loader.load_report['float32'],
+        'data_mb': data_mb,
+        'indicator_frame_mb': prepared_mb,
+        'peak_mb': peak_mb,
+        'metrics': engine.performance(),
+    }, curve['equity']
+
+def validate(reference, lean, ref_equity, lean_equity, rtol):
+    """lean 模式與 float64 的相對誤差；全部指標與權益曲線都在 rtol 內才算通過"""
+    checks = {}
+    for key in CHECK_METRICS:
+        a, b = float(reference['metrics'][key]), float(lean['metrics'][key])
+        err = abs(a - b) / max(abs(a), 1e-12)
+        checks[key] = {'float64': a, 'lean': b, 'rel_err': err, 'ok': err <= rtol}
+
+    common = ref_equity.index.intersection(lean_equity.index)
+    a = ref_equity.loc[common].to_numpy()
+    b = lean_equity.loc[common].to_numpy()
+    err = float(np.max(np.abs(a - b) / np.maximum(np.abs(a), 1e-12))) if len(common) else 0.0
+    checks['equity_curve'] = {'max_rel_err': err, 'ok': err <= rtol}
+    return {'rtol': rtol, 'passed': all(c['ok'] for c in checks.values()), 'checks': checks}
+
+def main():
+    parser = argparse.ArgumentParser(description='Memory-lean data path: memory report and float64 validation')
+    parser.add_argument('--bars', type=float, default=1e6, help='synthetic bars (ignored with --csv)')
+    parser.add_argument('--csv', default=None, help='use an existing CSV instead of synthetic data')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--rtol', type=float, default=1e-3, help='relative tolerance against float64')
+    parser.add_argument('--workdir', default=None)
+    parser.add_argument('--output', default=None, help='write the report as JSON')
+    args = parser.parse_args()
+
+    csv_path = args.csv
+    if csv_path is None:
+        workdir = args.workdir or os.path.join(tempfile.gettempdir(), 'crypto_bench')
+        os.makedirs(workdir, exist_ok=True)
+        csv_path = os.path.join(workdir, f'synthetic_{int(args.bars)}_{args.seed}.csv')
+        if not os.path.exists(csv_path):
+            write_csv(csv_path, int(args.bars), seed=args.seed)
+
+    reference, ref_equity = run_mode(csv_path, lean=False)
+    lean, lean_equity = run_mode(csv_path, lean=True)
+    validation = validate(reference, lean, ref_equity, lean_equity, args.rtol)
+
+    print(f"\n{'mode':<10} {'data MB':>10} {'indicators MB':>14} {'peak MB':>10}  float32")
+    for r in (reference, lean):
+        name = 'lean' if r['lean'] else 'float64'
+        print(f"{name:<10} {r['data_mb']:>10.1f} {r['indicator_frame_mb']:>14.1f} {r['peak_mb']:>10.1f}  {r['float32_columns']}")
+    print(f"peak memory ratio (lean / float64): {lean['peak_mb'] / reference['peak_mb']:.2f}")
+
+    print(f"\nValidation against float64 (rtol={args.rtol}): {'PASS' if validation['passed'] else 'FAIL'}")
+    for key, c in validation['checks'].items():
+        err = c.get('rel_err', c.get('max_rel_err'))
+        print(f"  {key:<14} rel_err={err:.2e} {'ok' if c['ok'] else 'EXCEEDS'}")
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump({'csv': csv_path, 'float64': reference, 'lean': lean, 'validation': validation}, f, indent=2)
+        print(f"Report written to {args.output}")
+    return 0 if validation['passed'] else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
\ No newline at end of file
@@ -0,0 +1,168 @@
+"""
+回測流水線基準測試 (完全離線，使用合成數據)
+
+用法:
+    python benchmarks/bench_pipeline.py --sizes 1e4 1e5 1e6
+    python benchmarks/bench_pipeline.py --sizes 1e5 --compare benchmarks/results/old.json
+
+逐階段計時 DataLoader.load_data (CSV / 快取)、prepare_indicators、run_fast、print_performance，
+並用 tracemalloc 記錄每個階段的峰值記憶體，結果寫成 JSON 以便跨 commit 比較
+"""
+import io
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+import tempfile
+import contextlib
+import subprocess
+import tracemalloc
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(HERE)
+sys.path[:0] = [ROOT, os.path.join(ROOT, 'strategies'), HERE]
+
+import numpy as np
+import pandas as pd
+
+from synthetic import write_csv
+from data_loader import DataLoader
+from strategy import StrategySMA_ATR
+from backtester import BacktestEngine
+from indicators import IndicatorCache
+
+def _measure(fn, memory=True, repeat=3):
+    """
+    返回 (結果, 秒數, 峰值 MB)；秒數取 repeat 次中的最小值
+    計時與記憶體追蹤分開跑，避免 tracemalloc 拖慢計時
+    """
+    with contextlib.redirect_stdout(io.StringIO()):
+        seconds = float('inf')
+        for _ in range(repeat):
+            start = time.perf_counter()
+            result = fn()
+            seconds = min(seconds, time.perf_counter() - start)
+
+        peak_mb = None
+        if memory:
+            tracemalloc.start()
+            fn()
+            peak_mb = tracemalloc.get_traced_memory()[1] / 1024 / 1024
+            tracemalloc.stop()
+    return result, seconds, peak_mb
+
+def bench_size(n_bars, workdir, memory=True, slow=False, seed=42, repeat=3):
+    csv_path = os.path.join(workdir, f'synthetic_{n_bars}_{seed}.csv')
+    if not os.path.exists(csv_path):
+        write_csv(csv_path, n_bars, seed=seed)
+
+    stages = {}
+    measure = lambda fn: _measure(fn, memory, repeat)
+    def record(name, seconds, peak_mb, bars):
+        stages[name] = {'seconds': seconds, 'peak_mb': peak_mb,
+                        'bars_per_sec': bars / seconds if seconds > 0 else None}
+
+    loader = DataLoader(csv_path)
+    df, sec, mem = measure(lambda: loader.load_data(use_cache=False))
+    record('load_csv', sec, mem, n_bars)
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        loader.load_data(rebuild=True) # 建立快取
+    df, sec, mem = measure(lambda: loader.load_data())
+    record('load_cache', sec, mem, n_bars)
+
+    # 每次使用全新快取，測的是真實計算成本
+    _, sec, mem = measure(lambda: StrategySMA_ATR(indicator_cache=IndicatorCache()).prepare_indicators(df))
+    record('prepare_indicators', sec, mem, len(df))
+
+    # 同樣每次使用全新快取，否則第二次起量到的是已快取指標的回測
+    def run_fast():
+        engine = BacktestEngine()
+        engine.run_fast(df, StrategySMA_ATR(indicator_cache=IndicatorCache()))
+        return engine
+    engine, sec, mem = measure(run_fast)
+    record('run_fast', sec, mem, len(df))
+
+    _, sec, mem = measure(engine.print_performance)
+    record('print_performance', sec, mem, len(df))
+
+    if slow:
+        # 逐根 df.iloc 的原始引擎，只適合小數據 (只跑一次)
+        _, sec, mem = _measure(lambda: BacktestEngine().run(df, StrategySMA_ATR(indicator_cache=IndicatorCache())), memory, repeat=1)
+        record('run', sec, mem, len(df))
+
+    return {'bars': n_bars, 'rows_loaded': len(df), 'trades': len(engine.trades), 'stages': stages}
+
+def _git_commit():
+    try:
+        out = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, capture_output=True, text=True)
+        return out.stdout.strip() or None
+    except OSError:
+        return None
+
+def compare(current, baseline_path):
+    """打印與舊結果的耗時比例 (>1 代表變慢)"""
+    with open(baseline_path, 'r', encoding='utf-8') as f:
+        baseline = json.load(f)
+    old = {r['bars']: r for r in baseline['results']}
+    print(f"\nCompare against {baseline_path} (commit {baseline.get('commit')})")
+    print(f"{'bars':>10} {'stage':<20} {'old s':>10} {'new s':>10} {'ratio':>8}")
+    for r in current['results']:
+        if r['bars'] not in old:
+            continue
+        for stage, m in r['stages'].items():
+            o = old[r['bars']]['stages'].get(stage)
+            if not o:
+                continue
+            ratio = m['seconds'] / o['seconds'] if o['seconds'] else float('nan')
+            flag = '  <-- slower' if ratio > 1.2 else ''
+            print(f"{r['bars']:>10} {stage:<20} {o['seconds']:>10.4f} {m['seconds']:>10.4f} {ratio:>8.2f}{flag}")
+
+def main():
+    parser = argparse.ArgumentParser(description='Backtest pipeline benchmark (synthetic data)')
+    parser.add_argument('--sizes', nargs='+', type=float, default=[1e4, 1e5, 1e6], help='bars per run (1e4 - 1e7)')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--repeat', type=int, default=3, help='timing repeats per stage (best-of)')
+    parser.add_argument('--workdir', default=None, help='where synthetic CSVs are cached (default: temp dir)')
+    parser.add_argument('--output', default=None, help='JSON result path (default: benchmarks/results/<commit>_<time>.json)')
+    parser.add_argument('--no-memory', action='store_true', help='skip tracemalloc peak memory pass')
+    parser.add_argument('--slow', action='store_true', help='also time the per-row BacktestEngine.run (small sizes only)')
+    parser.add_argument('--compare', default=None, help='previous JSON result to compare against')
+    args = parser.parse_args()
+
+    workdir = args.workdir or os.path.join(tempfile.gettempdir(), 'crypto_bench')
+    os.makedirs(workdir, exist_ok=True)
+
+    report = {
+        'commit': _git_commit(),
+        'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'pandas': pd.__version__,
+        'machine': platform.machine(),
+        'cpu_count': os.cpu_count(),
+        'results': [],
+    }
+
+    for size in args.sizes:
+        n_bars = int(size)
+        print(f"--- Benchmark: {n_bars} bars ---")
+        result = bench_size(n_bars, workdir, memory=not args.no_memory, slow=args.slow, seed=args.seed, repeat=args.repeat)
+        for stage, m in result['stages'].items():
+            mem = f"{m['peak_mb']:.1f} MB" if m['peak_mb'] is not None else '-'
+            print(f"  {stage:<20} {m['seconds']:>9.4f}s  {mem:>10}")
+        report['results'].append(result)
+
+    output = args.output or os.path.join(HERE, 'results', f"{report['commit'] or 'nogit'}_{time.strftime('%Y%m%d_%H%M%S')}.json")
+    os.makedirs(os.path.dirname(output), exist_ok=True)
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2)
+    print(f"Results written to {output}")
+
+    if args.compare:
+        compare(report, args.compare)
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
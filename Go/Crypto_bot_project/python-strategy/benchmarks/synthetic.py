@@ -0,0 +1,35 @@
+import numpy as np
+import pandas as pd
+
+def generate_ohlcv(n_bars, seed=42, start_price=10000.0, volatility=0.001, start_time=1325317920):
+    """
+    確定性的合成一分鐘K線 (幾何隨機漫步)，欄位格式與 btcusd_1-min_data.csv 相同
+    同一個 seed 永遠生成完全相同的數據，方便在不同 commit 之間比較效能
+    """
+    rng = np.random.default_rng(seed)
+    log_returns = rng.normal(0.0, volatility, n_bars)
+    close = start_price * np.exp(np.cumsum(log_returns))
+    open_ = np.empty(n_bars)
+    open_[0] = start_price
+    open_[1:] = close[:-1]
+
+    wick_up = np.abs(rng.normal(0.0, volatility / 2, n_bars))
+    wick_down = np.abs(rng.normal(0.0, volatility / 2, n_bars))
+    high = np.maximum(open_, close) * (1 + wick_up)
+    low = np.minimum(open_, close) * (1 - wick_down)
+    volume = rng.gamma(2.0, 2.5, n_bars)
+
+    return pd.DataFrame({
+        'Timestamp': (start_time + 60 * np.arange(n_bars)).astype(np.float64),
+        'Open': np.round(open_, 2),
+        'High': np.round(high, 2),
+        'Low': np.round(low, 2),
+        'Close': np.round(close, 2),
+        'Volume': volume,
+    })
+
+def write_csv(path, n_bars, seed=42):
+    """生成並寫出 CSV"""
+    df = generate_ohlcv(n_bars, seed=seed)
+    df.to_csv(path, index=False)
+    return path
\ No newline at end of file
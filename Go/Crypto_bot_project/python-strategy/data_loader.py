@@ -1,43 +1,313 @@
+import os
+import json
+import time
+import shutil
+import hashlib
+import numpy as np
 import pandas as pd
+from resample import resample_ohlcv
+from profiler import NULL_PROFILER
 
 class DataLoader:
-    def __init__(self, filepath):
+    CACHE_VERSION = 1
+    HASH_BLOCK = 1 << 20 # 指紋只雜湊檔案頭尾各 1MB，避免每次掃描整個大檔
+    LEAN_COLUMNS = ('Timestamp', 'timestamp', 'Open', 'High', 'Low', 'Close', 'Volume')
+    FLOAT32_COLUMNS = ('Open', 'High', 'Low', 'Close')
+
+    def __init__(self, filepath, cache_dir=None, profiler=None, lean=False, price_decimals=2):
+        """
+        lean: 省記憶體模式 —— 只讀取 LEAN_COLUMNS，OHLC 在精度允許時存為 float32，split_data 不複製
+        price_decimals: 價格的小數位數；float32 值按此位數四捨五入後必須逐值等於原 float64 值才轉換，
+                        因此之後可以精確還原 (df.attrs['price_decimals'])，計算結果與 float64 完全一致
+        """
         self.filepath = filepath
+        self.cache_dir = cache_dir or f"{filepath}.cache"
+        self.profiler = profiler or NULL_PROFILER # profiler.RunProfiler (分階段計時，預設關閉)
+        self.lean = lean
+        self.price_decimals = price_decimals
         self.df = None
+        self.load_report = None
+
+    @property
+    def _frame_dir(self):
+        """主數據快取目錄 (lean 模式使用獨立的子目錄，與 float64 快取互不覆蓋)"""
+        return os.path.join(self.cache_dir, 'lean') if self.lean else self.cache_dir
+
+    def load_data(self, use_cache=True, rebuild=False):
+        """
+        讀取並清洗數據
+        use_cache: 優先從列式二進位快取 (NPY memmap) 載入；快取不存在或源文件已變更時重新解析 CSV 並寫入快取
+        rebuild: 強制忽略現有快取，重新解析 CSV 並重建快取
+        """
+        start = time.perf_counter()
+        source = 'csv'
 
-    def load_data(self):
-        """讀取並清洗數據"""
+        with self.profiler.stage('load_data'):
+            df = None
+            if use_cache and not rebuild:
+                df = self._load_cache()
+                if df is not None:
+                    source = 'cache'
+
+            if df is None:
+                df = self._load_csv()
+                if use_cache:
+                    self._write_cache(df)
+
+        if self.lean:
+            df.attrs['price_decimals'] = self.price_decimals
+        self.df = df
+        self.profiler.add_bars('load_data', len(df))
+        elapsed = time.perf_counter() - start
+        self.load_report = {'source': source, 'seconds': elapsed, 'rows': len(self.df),
+                            'nbytes': int(self.df.memory_usage(index=True, deep=True).sum()),
+                            'float32': [c for c in self.df.columns if self.df[c].dtype == np.float32]}
+        print(f"Data loaded: {len(self.df)} rows. (from {source} in {elapsed:.2f}s)")
+        return self.df
+
+    def _load_csv(self):
+        """解析原始 CSV：處理時間格式、清除空值、去重"""
         print(f"Loading data from {self.filepath}...")
-        self.df = pd.read_csv(self.filepath)
+        df = pd.read_csv(self.filepath, usecols=self._usecols())
         
         # 處理時間格式
-        if 'Timestamp' in self.df.columns:
-            self.df['datetime'] = pd.to_datetime(self.df['Timestamp'], unit='s')
-        elif 'timestamp' in self.df.columns:
-            self.df['datetime'] = pd.to_datetime(self.df['timestamp'], unit='s')
-        
-        self.df.set_index('datetime', inplace=True)
+        df = parse_timestamps(df)
         
         # 清除空值
-        self.df.dropna(inplace=True)
+        df.dropna(inplace=True)
         
         # 去重
-        self.df = self.df[~self.df.index.duplicated(keep='first')]
-        print(f"Data loaded: {len(self.df)} rows.")
-        return self.df
+        df = df[~df.index.duplicated(keep='first')]
+
+        if self.lean:
+            df = self._lean_frame(df)
+        return df
+
+    def _usecols(self):
+        """read_csv 的 usecols：lean 模式只讀 LEAN_COLUMNS，否則讀全部欄位"""
+        if not self.lean:
+            return None
+        header = pd.read_csv(self.filepath, nrows=0).columns
+        return [c for c in header if c in self.LEAN_COLUMNS]
+
+    def _lean_frame(self, df):
+        """時間已在索引中，不再保留原始時間戳欄位；OHLC 盡量轉 float32"""
+        df = df.drop(columns=[c for c in ('Timestamp', 'timestamp') if c in df.columns])
+        return self._downcast(df)
+
+    def _downcast(self, df):
+        """OHLC 逐欄轉 float32；無法按 price_decimals 精確還原 (價格太大或小數位更多) 的欄位保留 float64"""
+        for col in self.FLOAT32_COLUMNS:
+            if col not in df.columns:
+                continue
+            values = df[col].to_numpy(dtype=np.float64)
+            narrow = values.astype(np.float32)
+            if np.array_equal(np.round(narrow.astype(np.float64), self.price_decimals), values):
+                df[col] = narrow
+            else:
+                print(f"Keeping {col} as float64 (float32 cannot restore it at {self.price_decimals} decimals)")
+        return df
+
+    def iter_chunks(self, chunksize=1_000_000):
+        """
+        分塊讀取並清洗數據 (串流回測用，記憶體只與 chunksize 有關)
+        清洗規則與 load_data 相同；假設數據按時間排序，跨塊的重複時間戳只保留第一筆
+        lean 模式與 load_data 相同：只讀 LEAN_COLUMNS，OHLC 逐塊轉 float32 並帶上 attrs['price_decimals']
+        """
+        print(f"Streaming data from {self.filepath} (chunksize={chunksize})...")
+        last_time = None
+        for chunk in pd.read_csv(self.filepath, chunksize=chunksize, usecols=self._usecols()):
+            chunk = parse_timestamps(chunk)
+
+            chunk.dropna(inplace=True)
+            chunk = chunk[~chunk.index.duplicated(keep='first')]
+            if last_time is not None:
+                chunk = chunk[chunk.index > last_time]
+            if len(chunk):
+                last_time = chunk.index[-1]
+                if self.lean:
+                    chunk = self._lean_frame(chunk)
+                    chunk.attrs['price_decimals'] = self.price_decimals
+                yield chunk
+
+    # ==========================================
+    # 列式快取 (每個欄位一個 .npy + int64 epoch 索引)
+    # ==========================================
+
+    def fingerprint(self):
+        """源文件指紋：大小 + 修改時間 + 頭尾內容雜湊"""
+        stat = os.stat(self.filepath)
+        digest = hashlib.sha1()
+        with open(self.filepath, 'rb') as f:
+            digest.update(f.read(self.HASH_BLOCK))
+            if stat.st_size > self.HASH_BLOCK:
+                f.seek(max(stat.st_size - self.HASH_BLOCK, self.HASH_BLOCK))
+                digest.update(f.read())
+        return {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns, 'sha1': digest.hexdigest()}
+
+    def invalidate_cache(self):
+        """刪除快取，下次 load_data 將重新解析 CSV"""
+        if os.path.isdir(self.cache_dir):
+            shutil.rmtree(self.cache_dir)
+            print(f"Cache invalidated: {self.cache_dir}")
+
+    def _load_cache(self):
+        """快取有效時以 memmap 載入，否則返回 None"""
+        df, meta = _load_frame(self._frame_dir)
+        if df is None:
+            return None
+
+        if (meta.get('version') != self.CACHE_VERSION or meta.get('fingerprint') != self.fingerprint()
+                or meta.get('lean', False) != self.lean):
+            print("Cache is stale, rebuilding...")
+            return None
+        return df
+
+    def _write_cache(self, df):
+        """寫入列式快取；含非數值欄位時跳過"""
+        non_numeric = [c for c in df.columns if not pd.api.types.is_numeric_dtype(df[c])]
+        if non_numeric:
+            print(f"Cache skipped: non-numeric columns {non_numeric}")
+            return
+
+        meta = {'version': self.CACHE_VERSION, 'fingerprint': self.fingerprint(), 'lean': self.lean}
+        if self.lean:
+            # lean 快取放在 cache_dir/lean/，只替換自己的子目錄
+            os.makedirs(self.cache_dir, exist_ok=True)
+            tmp_dir = f"{self._frame_dir}.tmp"
+            _save_frame(df, tmp_dir, meta)
+            if os.path.isdir(self._frame_dir):
+                shutil.rmtree(self._frame_dir)
+            os.replace(tmp_dir, self._frame_dir)
+            print(f"Cache written: {self._frame_dir}")
+            return
+
+        tmp_dir = f"{self.cache_dir}.tmp"
+        _save_frame(df, tmp_dir, meta)
+
+        # 寫完再整體替換，避免中斷時留下半個快取 (舊的多週期快取一併失效)
+        self.invalidate_cache()
+        os.replace(tmp_dir, self.cache_dir)
+        print(f"Cache written: {self.cache_dir}")
+
+    def load_timeframe(self, rule, rebuild=False):
+        """
+        多週期K線 (例如 '5min' / '15min' / '1h' / '4h' / '1D')，由一分鐘K線聚合
+        聚合結果快取在 cache_dir/tf_<rule>/，與基礎數據指紋綁定，源 CSV 變更後自動重建
+        """
+        directory = os.path.join(self.cache_dir, f"tf_{rule}_lean" if self.lean else f"tf_{rule}")
+        fingerprint = self.fingerprint()
+        if not rebuild:
+            bars, meta = _load_frame(directory)
+            if bars is not None and meta.get('fingerprint') == fingerprint:
+                if self.lean:
+                    bars.attrs['price_decimals'] = self.price_decimals # 列式快取不保存 attrs
+                print(f"Timeframe {rule} loaded from cache: {len(bars)} bars.")
+                return bars
+
+        if self.df is None:
+            self.load_data()
+        bars = resample_ohlcv(self.df, rule)
+        _save_frame(bars, directory, {'version': self.CACHE_VERSION, 'fingerprint': fingerprint, 'rule': rule})
+        print(f"Timeframe {rule} built: {len(self.df)} -> {len(bars)} bars.")
+        return bars
+
+    def load_range(self, start=None, end=None, store_dir=None):
+        """
+        從增量存儲 (bar_store.BarStore，預設在 <csv>.store/) 讀取 [start, end) 的數據
+        先把 CSV 新增的行追加進存儲 (只解析上次讀到位置之後的部分)，再在 epoch 索引上二分查找時間範圍，
+        只從磁碟讀取該區間的行；例如 load_range(start=pd.Timestamp.now() - pd.Timedelta(days=30))
+        與 load_data 的行相同 (同樣去空值、去重複時間戳)，但始終按時間排序 (亂序的 CSV 在 load_data 中保持原行序)
+        """
+        from bar_store import BarStore
+
+        start_time = time.perf_counter()
+        store = BarStore(store_dir or f"{self.filepath}.store")
+        with self.profiler.stage('ingest'):
+            store.ingest_csv(self.filepath)
+
+        with self.profiler.stage('load_data'):
+            df = store.load(start, end)
+            if self.lean:
+                df = self._lean_frame(df)
+                df.attrs['price_decimals'] = self.price_decimals
+
+        self.df = df
+        self.profiler.add_bars('load_data', len(df))
+        elapsed = time.perf_counter() - start_time
+        self.load_report = {'source': 'store', 'seconds': elapsed, 'rows': len(df), 'store_rows': len(store),
+                            'gaps': len(store.gaps(start, end)),
+                            'nbytes': int(df.memory_usage(index=True, deep=True).sum()),
+                            'float32': [c for c in df.columns if df[c].dtype == np.float32]}
+        print(f"Data loaded: {len(df)} of {len(store)} rows. (from store in {elapsed:.2f}s)")
+        return df
 
     def split_data(self, split_ratio=0.8):
         """
         將數據切分為 Test Set (用於優化/滾動測試) 和 Validation Set (未知未來)
         split_ratio: 0.8 代表前 80% 是測試集，後 20% 是驗證集
+        lean 模式下返回切片視圖而不是副本 (不要原地修改返回的 DataFrame)
         """
         if self.df is None:
             self.load_data()
             
         split_index = int(len(self.df) * split_ratio)
         
-        test_set = self.df.iloc[:split_index].copy()
-        validation_set = self.df.iloc[split_index:].copy()
+        with self.profiler.stage('split_data', bars=len(self.df)):
+            if self.lean:
+                test_set = self.df.iloc[:split_index]
+                validation_set = self.df.iloc[split_index:]
+            else:
+                test_set = self.df.iloc[:split_index].copy()
+                validation_set = self.df.iloc[split_index:].copy()
         
         print(f"Data Split -> Test Set: {len(test_set)} | Validation Set: {len(validation_set)}")
-        return test_set, validation_set
\ No newline at end of file
+        return test_set, validation_set
+
+def parse_timestamps(df):
+    """Timestamp / timestamp 欄位 (Unix 秒) 轉為 datetime 索引"""
+    if 'Timestamp' in df.columns:
+        df['datetime'] = pd.to_datetime(df['Timestamp'], unit='s')
+    elif 'timestamp' in df.columns:
+        df['datetime'] = pd.to_datetime(df['timestamp'], unit='s')
+
+    df.set_index('datetime', inplace=True)
+    return df
+
+# ==========================================
+# 列式存儲工具 (每個欄位一個 .npy + int64 epoch 索引 + meta.json)
+# ==========================================
+
+def _save_frame(df, directory, meta):
+    """把數值型 DataFrame 按欄位寫成 .npy"""
+    if os.path.isdir(directory):
+        shutil.rmtree(directory)
+    os.makedirs(directory)
+
+    epoch = df.index.values.astype('datetime64[ns]').view('int64')
+    np.save(os.path.join(directory, 'index.npy'), epoch)
+    for i, col in enumerate(df.columns):
+        np.save(os.path.join(directory, f'col_{i}.npy'), np.ascontiguousarray(df[col].to_numpy()))
+
+    meta = dict(meta, columns=list(df.columns), index_name=df.index.name,
+                index_dtype=str(df.index.dtype), rows=len(df))
+    with open(os.path.join(directory, 'meta.json'), 'w', encoding='utf-8') as f:
+        json.dump(meta, f, indent=2)
+
+def _load_frame(directory):
+    """以 memmap 讀回 _save_frame 寫出的 DataFrame；不存在或損壞時返回 (None, None)"""
+    try:
+        with open(os.path.join(directory, 'meta.json'), 'r', encoding='utf-8') as f:
+            meta = json.load(f)
+    except (OSError, ValueError):
+        return None, None
+
+    # mmap_mode='c': 寫入時複製，不會改動磁碟上的快取
+    epoch = np.load(os.path.join(directory, 'index.npy'), mmap_mode='c')
+    index = pd.DatetimeIndex(epoch.view('datetime64[ns]'), name=meta['index_name'])
+    if str(index.dtype) != meta['index_dtype']:
+        index = index.astype(meta['index_dtype'])
+
+    columns = {col: np.load(os.path.join(directory, f'col_{i}.npy'), mmap_mode='c')
+               for i, col in enumerate(meta['columns'])}
+    return pd.DataFrame(columns, index=index, copy=False), meta
\ No newline at end of file
@@ -2,23 +2,29 @@ import matplotlib.pyplot as plt
 from data_loader import DataLoader
 from strategy import StrategySMA_ATR
 from backtester import BacktestEngine
+from profiler import RunProfiler
 
 def main():
     # 1. 設置參數
     FILE_PATH = 'btcusd_1-min_data.csv' # 確保您的檔名正確
     INITIAL_CAPITAL = 10000
     FEE_RATE = 0.001 # 0.1%
+    PROFILE = False # True: 記錄各階段耗時/記憶體，並輸出 JSON 運行報告
+    REPORT_PATH = 'run_report.json'
+    LEAN = False # True: float32 價格 + 不複製切分 (結果與 float64 相同，記憶體約減半，見 benchmarks/bench_lean.py)
+
+    profiler = RunProfiler(enabled=PROFILE, memory=PROFILE, cprofile=['bar_loop'], name='main')
 
     # 2. 載入並切分數據
-    loader = DataLoader(FILE_PATH)
+    loader = DataLoader(FILE_PATH, profiler=profiler, lean=LEAN)
     test_set, validation_set = loader.split_data(split_ratio=0.8)
 
     # 3. 初始化策略
     # 您可以在這裡調整參數
-    strategy = StrategySMA_ATR(fast_period=20, slow_period=50, atr_period=14)
+    strategy = StrategySMA_ATR(fast_period=20, slow_period=50, atr_period=14, lean=LEAN)
 
     # 4. 初始化回測引擎
-    engine = BacktestEngine(initial_balance=INITIAL_CAPITAL, fee_rate=FEE_RATE)
+    engine = BacktestEngine(initial_balance=INITIAL_CAPITAL, fee_rate=FEE_RATE, profiler=profiler)
 
     # ==========================================
     # Phase 1: Test Set (Expanding Walk-Forward)
@@ -26,9 +32,9 @@ def main():
     print("\n>>> STARTING TEST SET (WALK FORWARD SIMULATION) <<<")
     
     # 這裡我們簡單模擬：直接跑完整個 Test Set
-    # 如果要做 Rolling Window，可以寫一個迴圈切片 test_set
-    engine.run(test_set, strategy)
-    engine.print_performance()
+    # 如果要做 Rolling Window，請使用 walk_forward.WalkForward (滾動/擴展窗口 + 每段優化參數)
+    engine.run_fast(test_set, strategy) # 與 engine.run 結果一致，速度快數十倍
+    test_metrics = engine.print_performance()
     # ... (Phase 1 跑完後) ...
     
     engine.plot_results(test_set, title="Phase 1: Test Set Result")
@@ -42,9 +48,13 @@ def main():
         print("\n❌ Account Busted in Test Phase. Skipping Validation Phase.")
     else:
         print("\n>>> STARTING VALIDATION SET <<<")
-        val_engine = BacktestEngine(initial_balance=new_capital, fee_rate=FEE_RATE)
-        val_engine.run(validation_set, strategy)
+        val_engine = BacktestEngine(initial_balance=new_capital, fee_rate=FEE_RATE, profiler=profiler)
+        val_engine.run_fast(validation_set, strategy)
         val_engine.plot_results(validation_set, title="Phase 2: Validation Set")
 
+    if PROFILE:
+        profiler.print_summary()
+        profiler.write(REPORT_PATH, performance=test_metrics)
+
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,136 @@
+import numpy as np
+
+# 交易記錄的結構化陣列格式 (時間為 int64 epoch 納秒)
+TRADE_DTYPE = np.dtype([
+    ('entry_time', 'i8'), ('exit_time', 'i8'),
+    ('entry_price', 'f8'), ('exit_price', 'f8'),
+    ('size', 'f8'), ('pnl', 'f8'),
+])
+
+NS_PER_YEAR = 365 * 24 * 3600 * 10**9
+
+class TradeRecorder:
+    """預分配的結構化陣列交易記錄 (容量不足時倍增)"""
+    def __init__(self, capacity=1024):
+        self._data = np.zeros(capacity, dtype=TRADE_DTYPE)
+        self.count = 0
+
+    def append(self, entry_time, exit_time, entry_price, exit_price, size, pnl):
+        if self.count == len(self._data):
+            grown = np.zeros(len(self._data) * 2, dtype=TRADE_DTYPE)
+            grown[:self.count] = self._data
+            self._data = grown
+        self._data[self.count] = (_to_epoch(entry_time), _to_epoch(exit_time), entry_price, exit_price, size, pnl)
+        self.count += 1
+
+    @property
+    def array(self):
+        """已記錄的交易 (結構化陣列視圖)"""
+        return self._data[:self.count]
+
+    @property
+    def pnl(self):
+        return self._data['pnl'][:self.count]
+
+    def __len__(self):
+        return self.count
+
+class EquityRecorder:
+    """預分配的 float64 權益曲線 (長度已知時使用)"""
+    def __init__(self, n):
+        self.values = np.empty(n, dtype=np.float64)
+        self.count = 0
+
+    def append(self, equity):
+        self.values[self.count] = equity
+        self.count += 1
+
+    @property
+    def array(self):
+        return self.values[:self.count]
+
+def _to_epoch(t):
+    """Timestamp / datetime64 / int -> int64 epoch 納秒"""
+    if t is None:
+        return 0
+    if isinstance(t, (int, np.integer)):
+        return int(t)
+    return int(np.datetime64(t, 'ns').astype(np.int64))
+
+def compute_metrics(equity, pnl, initial_balance, times=None, trades=None, periods_per_year=None):
+    """
+    向量化績效指標 (全部基於 NumPy 陣列，無逐筆 Python 循環)
+    equity: 每根K線的權益；pnl: 每筆已平倉交易的盈虧
+    times: 每根K線的 int64 epoch 納秒 (用於年化、回撤時長與持倉比例)
+    trades: TRADE_DTYPE 結構化陣列 (用於計算持倉比例 exposure)
+    返回 dict，方便程式化使用 (參數掃描、Walk-Forward、報告輸出)
+    """
+    equity = np.asarray(equity, dtype=np.float64)
+    pnl = np.asarray(pnl, dtype=np.float64)
+    n = len(equity)
+
+    final_equity = float(equity[-1]) if n else float(initial_balance)
+    metrics = {
+        'final_equity': final_equity,
+        'total_return': (final_equity - initial_balance) / initial_balance * 100,
+        'max_drawdown': 0.0,
+        'max_drawdown_bars': 0,
+        'max_drawdown_days': 0.0,
+        'sharpe': 0.0,
+        'sortino': 0.0,
+        'exposure': 0.0,
+        'trades': int(len(pnl)),
+        'win_rate': 0.0,
+        'profit_factor': 0.0,
+        'avg_win': 0.0,
+        'avg_loss': 0.0,
+    }
+
+    if n:
+        # 回撤與回撤時長 (距離上一次創新高的K線數)
+        peak = np.maximum.accumulate(equity)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            drawdown = np.where(peak > 0, (equity - peak) / peak, 0.0)
+        metrics['max_drawdown'] = float(drawdown.min() * 100)
+
+        bars = np.arange(n)
+        last_peak = np.maximum.accumulate(np.where(equity >= peak, bars, 0))
+        duration = bars - last_peak
+        worst = int(duration.argmax())
+        metrics['max_drawdown_bars'] = int(duration[worst])
+
+        if times is not None:
+            times = np.asarray(times, dtype=np.int64)
+            metrics['max_drawdown_days'] = float((times[worst] - times[last_peak[worst]]) / (86400 * 10**9))
+            if periods_per_year is None and n > 1:
+                step = np.median(np.diff(times))
+                periods_per_year = NS_PER_YEAR / step if step > 0 else None
+
+    if n > 1:
+        # 逐根收益率的 Sharpe / Sortino (年化)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            returns = np.diff(equity) / equity[:-1]
+        returns = returns[np.isfinite(returns)]
+        scale = np.sqrt(periods_per_year) if periods_per_year else 1.0
+        if len(returns):
+            mean = returns.mean()
+            std = returns.std()
+            downside = np.sqrt(np.mean(np.minimum(returns, 0.0) ** 2))
+            metrics['sharpe'] = float(mean / std * scale) if std > 0 else 0.0
+            metrics['sortino'] = float(mean / downside * scale) if downside > 0 else 0.0
+
+    if trades is not None and times is not None and n:
+        # 持倉比例：每筆交易持有的K線數 / 總K線數
+        held = np.searchsorted(times, trades['exit_time']) - np.searchsorted(times, trades['entry_time'])
+        metrics['exposure'] = float(held.sum() / n * 100)
+
+    if len(pnl):
+        wins = pnl[pnl > 0]
+        losses = pnl[pnl <= 0]
+        gross_loss = -losses.sum()
+        metrics['win_rate'] = float(len(wins) / len(pnl) * 100)
+        metrics['profit_factor'] = float(wins.sum() / gross_loss) if gross_loss > 0 else float('inf')
+        metrics['avg_win'] = float(wins.mean()) if len(wins) else 0.0
+        metrics['avg_loss'] = float(losses.mean()) if len(losses) else 0.0
+
+    return metrics
\ No newline at end of file
@@ -0,0 +1,111 @@
+import numpy as np
+
+# 與 main.py 一致：權益剩不到 100 塊就算破產
+BUST_THRESHOLD = 100
+
+def trade_returns(pnl, initial_balance):
+    """
+    把每筆交易的 PnL 換算成相對於進場前資金的收益率
+    (策略按資金比例下單，用收益率重抽樣才能正確複利)
+    """
+    pnl = np.asarray(pnl, dtype=np.float64)
+    balance_before = initial_balance + np.concatenate(([0.0], np.cumsum(pnl)[:-1]))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        returns = np.where(balance_before > 0, pnl / balance_before, -1.0)
+    return returns
+
+def bar_returns(equity):
+    """權益曲線的逐根收益率 (用於 block bootstrap，保留短期自相關)"""
+    equity = np.asarray(equity, dtype=np.float64)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        returns = np.diff(equity) / equity[:-1]
+    return returns[np.isfinite(returns)]
+
+def _sample_paths(rng, log_growth, n_paths, method, block_size):
+    """一次生成 (n_paths, steps) 的重抽樣對數收益矩陣"""
+    length = len(log_growth)
+    if method == 'permutation':
+        # 交易順序打亂 (不放回)：每一行都是原序列的一個排列，直接原地洗牌數值省去索引 gather
+        paths = np.tile(log_growth, (n_paths, 1))
+        rng.permuted(paths, axis=1, out=paths)
+        return paths
+    if method == 'bootstrap':
+        return log_growth[rng.integers(0, length, size=(n_paths, length), dtype=np.int32)]
+    if method == 'block':
+        # 環形 block bootstrap：隨機起點 + 連續 block_size 根，保留短期自相關
+        n_blocks = -(-length // block_size)
+        starts = rng.integers(0, length, size=(n_paths, n_blocks, 1), dtype=np.int32)
+        idx = (starts + np.arange(block_size, dtype=np.int32)) % length
+        return log_growth[idx.reshape(n_paths, -1)[:, :length]]
+    raise ValueError("method must be 'permutation', 'bootstrap' or 'block'")
+
+def simulate(returns, initial_balance, n_paths=10000, method='permutation', block_size=20,
+             ruin_threshold=BUST_THRESHOLD, seed=None, dtype=np.float32, max_bytes=32 * 1024 * 1024):
+    """
+    蒙地卡羅穩健性測試 (完全向量化)
+    returns: 每筆交易 (trade_returns) 或每根K線 (bar_returns) 的收益率
+    method: 'permutation' 交易順序打亂 / 'bootstrap' 有放回抽樣 / 'block' 區塊 bootstrap
+    路徑以 (paths, steps) 的 2-D 對數權益陣列批量計算 (預設 float32)，
+    每批矩陣不超過 max_bytes，保持在 CPU 快取友好的大小
+    返回 dict：每條路徑的期末權益、最大回撤、是否破產，以及匯總分佈
+    """
+    returns = np.asarray(returns, dtype=np.float64)
+    length = len(returns)
+    rng = np.random.default_rng(seed)
+
+    final_equity = np.empty(n_paths, dtype=np.float64)
+    max_drawdown = np.empty(n_paths, dtype=np.float64)
+    ruined = np.zeros(n_paths, dtype=bool)
+
+    if length == 0:
+        final_equity[:] = initial_balance
+        max_drawdown[:] = 0.0
+        return _summarize(final_equity, max_drawdown, ruined, initial_balance, method, length)
+
+    # 對數空間：複利 = 累加；虧光 (收益率 <= -100%) 為 -inf，之後一直為 0
+    with np.errstate(divide='ignore'):
+        log_growth = np.log(np.maximum(1.0 + returns, 0.0)).astype(dtype)
+    log_ruin = np.log(ruin_threshold / initial_balance) if ruin_threshold > 0 else -np.inf
+
+    chunk = max(1, min(n_paths, max_bytes // (length * np.dtype(dtype).itemsize)))
+    for start in range(0, n_paths, chunk):
+        stop = min(start + chunk, n_paths)
+        log_equity = _sample_paths(rng, log_growth, stop - start, method, block_size)
+        np.cumsum(log_equity, axis=1, out=log_equity)
+
+        # 回撤相對於歷史最高點 (包含起始資金)
+        peak = np.maximum.accumulate(np.maximum(log_equity, 0), axis=1)
+        max_drawdown[start:stop] = np.expm1((log_equity - peak).min(axis=1)) * 100
+        del peak
+
+        final_equity[start:stop] = initial_balance * np.exp(log_equity[:, -1].astype(np.float64))
+        ruined[start:stop] = log_equity.min(axis=1) <= log_ruin
+
+    return _summarize(final_equity, max_drawdown, ruined, initial_balance, method, length)
+
+def _summarize(final_equity, max_drawdown, ruined, initial_balance, method, length):
+    percentiles = [1, 5, 25, 50, 75, 95, 99]
+    return {
+        'method': method,
+        'paths': len(final_equity),
+        'steps': length,
+        'final_equity': final_equity,
+        'max_drawdown': max_drawdown,
+        'ruined': ruined,
+        'ruin_probability': float(ruined.mean() * 100),
+        'prob_loss': float((final_equity < initial_balance).mean() * 100),
+        'final_equity_pct': dict(zip(percentiles, np.percentile(final_equity, percentiles).tolist())),
+        'max_drawdown_pct': dict(zip(percentiles, np.percentile(max_drawdown, percentiles).tolist())),
+    }
+
+def print_report(result):
+    """打印蒙地卡羅分佈摘要"""
+    print(f"\n{'='*30}")
+    print(f"MONTE CARLO ({result['method']}, {result['paths']} paths x {result['steps']} steps)")
+    print(f"{'='*30}")
+    print(f"Ruin Probability : {result['ruin_probability']:.2f}%")
+    print(f"Prob. of Loss    : {result['prob_loss']:.2f}%")
+    print(f"{'pct':>5} {'Final Equity':>14} {'Max DD':>9}")
+    for p, eq in result['final_equity_pct'].items():
+        print(f"{p:>4}% {eq:>14.2f} {result['max_drawdown_pct'][p]:>8.2f}%")
+    print(f"{'='*30}\n")
\ No newline at end of file
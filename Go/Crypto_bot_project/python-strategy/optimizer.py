@@ -0,0 +1,159 @@
+import io
+import os
+import json
+import random
+import itertools
+import contextlib
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from multiprocessing import shared_memory
+
+import numpy as np
+import pandas as pd
+
+from strategy import StrategySMA_ATR, price_frame
+from backtester import BacktestEngine
+from profiler import RunProfiler
+
+# Worker 進程內的共享數據 (由 _init_worker 設置)
+_WORKER = {}
+
+def share_frame(df, columns):
+    """
+    把 OHLCV 欄位與 int64 時間索引寫入同一塊共享記憶體，返回 (shm, spec)
+    lean 數據的 float32 價格先按 attrs['price_decimals'] 精確還原 (見 strategy.price_frame)，
+    worker 拿到的與 float64 載入的數據逐值相同；attrs 一併帶給 worker
+    """
+    n, k = len(df), len(columns)
+    shm = shared_memory.SharedMemory(create=True, size=max((k + 1) * n * 8, 1))
+    block = np.ndarray((k, n), dtype=np.float64, buffer=shm.buf)
+    source = price_frame(df, columns)
+    for i, col in enumerate(columns):
+        block[i] = source[col].to_numpy(dtype=np.float64)
+    epoch = np.ndarray((n,), dtype=np.int64, buffer=shm.buf, offset=block.nbytes)
+    epoch[:] = df.index.values.astype('datetime64[ns]').view('int64')
+    spec = {'name': shm.name, 'shape': (n, k), 'columns': list(columns), 'index_name': df.index.name,
+            'attrs': dict(df.attrs)}
+    return shm, spec
+
+def attach_frame(spec):
+    """依據 spec 連接共享記憶體，零拷貝重建 DataFrame"""
+    shm = shared_memory.SharedMemory(name=spec['name'])
+    n, k = spec['shape']
+    block = np.ndarray((k, n), dtype=np.float64, buffer=shm.buf)
+    epoch = np.ndarray((n,), dtype=np.int64, buffer=shm.buf, offset=block.nbytes)
+    index = pd.DatetimeIndex(epoch.view('datetime64[ns]'), name=spec['index_name'])
+    df = pd.DataFrame({col: block[i] for i, col in enumerate(spec['columns'])}, index=index, copy=False)
+    df.attrs.update(spec.get('attrs', {}))
+    return shm, df
+
+def _json_default(value):
+    """checkpoint 序列化：numpy 純量 (例如 np.arange 建的參數網格) 轉成 Python 原生型別"""
+    if isinstance(value, np.generic):
+        return value.item()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+def evaluate(df, strategy_cls, params, initial_balance, fee_rate, start=None):
+    """
+    靜音執行單次快速回測，返回 (績效指標 + throughput bars/sec, 權益曲線)
+    start: 見 BacktestEngine.run_fast，之前的K線只用於指標預熱
+    """
+    strategy = strategy_cls(**params)
+    profiler = RunProfiler()
+    engine = BacktestEngine(initial_balance=initial_balance, fee_rate=fee_rate, profiler=profiler)
+    with profiler.stage('backtest', bars=len(df)), contextlib.redirect_stdout(io.StringIO()): # 靜音每次回測的 banner
+        equity = engine.run_fast(df, strategy, start=start)['equity']
+    summary = engine.performance()
+    summary['throughput'] = profiler.throughput('backtest')
+    return summary, equity
+
+def _init_worker(spec, strategy_cls, initial_balance, fee_rate):
+    shm, df = attach_frame(spec)
+    _WORKER.update(shm=shm, df=df, strategy_cls=strategy_cls,
+                   initial_balance=initial_balance, fee_rate=fee_rate)
+
+def _run_one(params):
+    """在 worker 中跑單組參數，返回 params + 績效指標"""
+    summary, _ = evaluate(_WORKER['df'], _WORKER['strategy_cls'], params,
+                          _WORKER['initial_balance'], _WORKER['fee_rate'])
+    return dict(params, **summary)
+
+class ParameterSweep:
+    """
+    StrategySMA_ATR 參數掃描 (Grid / Random Search)
+    - OHLCV 只放進一次共享記憶體，worker 零拷貝讀取 (不會把 DataFrame pickle 給每個進程)
+    - 每完成一組參數就追加寫入 checkpoint (JSON Lines，每行 {"params": ..., "result": ...})，
+      中斷後重跑會自動跳過已完成的組合 (按完整參數字典比對，包括 sl_atr_mult 等及自訂策略的參數)
+    """
+
+    def __init__(self, df, initial_balance=10000, fee_rate=0.001, strategy_cls=StrategySMA_ATR,
+                 workers=None, checkpoint=None, columns=('Open', 'High', 'Low', 'Close', 'Volume')):
+        self.df = df
+        self.initial_balance = initial_balance
+        self.fee_rate = fee_rate
+        self.strategy_cls = strategy_cls
+        self.workers = workers or os.cpu_count() or 1
+        self.checkpoint = checkpoint
+        self.columns = [c for c in columns if c in df.columns]
+
+    @staticmethod
+    def grid(fast_period, slow_period, atr_period, risk_per_trade=(0.03,)):
+        """笛卡兒積網格 (自動過濾 fast >= slow 的無效組合)"""
+        return [dict(fast_period=f, slow_period=s, atr_period=a, risk_per_trade=r)
+                for f, s, a, r in itertools.product(fast_period, slow_period, atr_period, risk_per_trade)
+                if f < s]
+
+    @staticmethod
+    def random(space, n_iter, seed=None):
+        """隨機搜索：space 為 {參數名: 候選值列表}，抽取 n_iter 組不重複的有效組合"""
+        rng = random.Random(seed)
+        combos = ParameterSweep.grid(space['fast_period'], space['slow_period'],
+                                     space['atr_period'], space.get('risk_per_trade', (0.03,)))
+        return rng.sample(combos, min(n_iter, len(combos)))
+
+    @staticmethod
+    def _key(params):
+        """斷點續跑的比對鍵：完整參數字典 (numpy 純量與 JSON 讀回的原生數值相等，鍵一致)"""
+        return tuple(sorted(params.items()))
+
+    def _load_checkpoint(self):
+        """{參數鍵: 結果行}；舊格式 (沒有 params 欄位) 的行無法可靠比對，忽略後重跑"""
+        done = {}
+        if self.checkpoint and os.path.exists(self.checkpoint):
+            with open(self.checkpoint, 'r', encoding='utf-8') as f:
+                for line in f:
+                    line = line.strip()
+                    if line:
+                        row = json.loads(line)
+                        if 'params' in row:
+                            done[self._key(row['params'])] = row['result']
+        return done
+
+    def run(self, param_sets, rank_by='total_return', ascending=False):
+        """平行執行所有參數組合，返回按 rank_by 排序的結果表"""
+        done = self._load_checkpoint()
+        pending = [p for p in param_sets if self._key(p) not in done]
+        print(f"--- Parameter Sweep: {len(pending)} to run, {len(param_sets) - len(pending)} resumed, {self.workers} workers ---")
+
+        if pending:
+            shm, spec = share_frame(self.df, self.columns)
+            try:
+                with ProcessPoolExecutor(max_workers=self.workers, initializer=_init_worker,
+                                         initargs=(spec, self.strategy_cls, self.initial_balance, self.fee_rate)) as pool:
+                    futures = {pool.submit(_run_one, p): p for p in pending}
+                    for count, future in enumerate(as_completed(futures), 1):
+                        params, result = futures[future], future.result()
+                        done[self._key(params)] = result
+                        if self.checkpoint:
+                            with open(self.checkpoint, 'a', encoding='utf-8') as f:
+                                f.write(json.dumps({'params': params, 'result': result}, default=_json_default) + '\n')
+                        if count % 10 == 0 or count == len(pending):
+                            print(f"  {count}/{len(pending)} done")
+            finally:
+                shm.close()
+                shm.unlink()
+
+        wanted = dict.fromkeys(self._key(p) for p in param_sets)
+        table = pd.DataFrame([done[key] for key in wanted])
+        if table.empty:
+            return table
+        return table.sort_values(rank_by, ascending=ascending).reset_index(drop=True)
\ No newline at end of file
@@ -0,0 +1,318 @@
+"""
+異步模擬盤 (Paper Trading)
+
+- 每個品種一個 SymbolSession：增量指標 (IncrementalSMA_ATR) + 記帳核心 (accounting.Account)，
+  逐根K線套用與 BacktestEngine.run 完全相同的進場、SL/TP、手續費與資金規則
+- 多個品種的K線流在同一個 asyncio 事件循環中並行消費，每根K線的處理是 O(1)，不會阻塞其他品種
+- 狀態 (資金、持倉、指標緩衝區、交易記錄) 定期寫入磁碟，重啟後直接續跑，不需要重放歷史；
+  權益曲線另存為只追加的日誌 (<state>.<symbol>.equity)，每次 checkpoint 只寫新增部分
+- 數據源：CSV 回放 (replay_csv，可全速或按倍速) 或 stream_bridge.TickBridge 的實時一分鐘K線 (bridge_streams)
+K線格式: {'time': int64 epoch 納秒, 'Open', 'High', 'Low', 'Close'}
+"""
+import os
+import re
+import pickle
+import asyncio
+import argparse
+
+import numpy as np
+
+from data_loader import DataLoader
+from strategy import StrategySMA_ATR
+from incremental import IncrementalSMA_ATR
+from accounting import Account
+from metrics import compute_metrics
+
+# 權益日誌的記錄格式 (每根K線一筆)
+EQUITY_DTYPE = np.dtype([('time', '<i8'), ('equity', '<f8')])
+
+class SymbolSession:
+    """
+    單一品種的模擬盤狀態
+    equity_path: 權益日誌 (只追加)；為 None 時權益曲線全部保存在記憶體 (例如回放比對)
+    """
+    def __init__(self, symbol, strategy, initial_balance=10000, fee_rate=0.001, equity_path=None):
+        self.symbol = symbol
+        self.initial_balance = initial_balance
+        self.indicators = IncrementalSMA_ATR(strategy)
+        self.account = Account(initial_balance, fee_rate)
+        self.equity_path = equity_path
+        self.logged = 0 # 已寫入日誌的行數
+        self._times = [] # 指標預熱後每根K線的時間與權益 (尚未寫入日誌的部分)
+        self._equity = []
+        self.last_time = None
+
+    def on_bar(self, bar):
+        """處理一根已收盤K線，返回 'BUY' / 'SELL' / None"""
+        timestamp = bar['time']
+        if self.last_time is not None and timestamp <= self.last_time:
+            return None # 重啟後重複送入的舊K線
+        self.last_time = timestamp
+
+        price = bar['Close']
+        if self.indicators.update(bar['High'], bar['Low'], price, timestamp) is None:
+            return None # 指標預熱中 (對應 prepare_indicators 的 dropna)
+
+        account = self.account
+        self._times.append(timestamp)
+        self._equity.append(account.equity(price))
+
+        if not self.indicators.is_ready:
+            return None # 第一根有效K線只記錄權益 (與回測 i < 1 相同)
+
+        sig_type, size, sl, tp, reason = self.indicators.signal(account.balance, account.fee_rate)
+        if account.in_position:
+            exit_reason = account.exit_reason(price)
+            if sig_type == 'SELL': exit_reason = reason # 技術性賣出優先
+            if exit_reason:
+                account.close(timestamp, price, exit_reason)
+                return 'SELL'
+        elif sig_type == 'BUY':
+            if account.open(timestamp, price, size, sl, tp, reason):
+                return 'BUY'
+        return None
+
+    def flush(self):
+        """把尚未寫入的權益追加到日誌 (只寫新增部分，不重寫歷史)"""
+        if self.equity_path is None or not self._times:
+            return
+        rows = np.empty(len(self._times), dtype=EQUITY_DTYPE)
+        rows['time'] = self._times
+        rows['equity'] = self._equity
+        with open(self.equity_path, 'ab') as f:
+            rows.tofile(f)
+        self.logged += len(rows)
+        self._times, self._equity = [], []
+
+    def equity_curve(self):
+        """完整權益曲線 (times, equity)：日誌 + 尚未寫入的部分"""
+        times = np.asarray(self._times, dtype=np.int64)
+        equity = np.asarray(self._equity, dtype=np.float64)
+        if self.equity_path is not None and self.logged:
+            log = np.fromfile(self.equity_path, dtype=EQUITY_DTYPE, count=self.logged)
+            times = np.concatenate([log['time'], times])
+            equity = np.concatenate([log['equity'], equity])
+        return times, equity
+
+    @property
+    def times(self):
+        return self.equity_curve()[0]
+
+    @property
+    def equity(self):
+        return self.equity_curve()[1]
+
+    def performance(self):
+        times, equity = self.equity_curve()
+        trades = self.account.trades.array
+        if self.account.in_position:
+            open_trade = np.zeros(1, dtype=trades.dtype)
+            open_trade['entry_time'] = self.account.entry_time
+            open_trade['exit_time'] = times[-1]
+            trades = np.concatenate([trades, open_trade])
+        return compute_metrics(equity, self.account.trades.pnl, self.initial_balance, times=times, trades=trades)
+
+    def __getstate__(self):
+        # 策略物件帶有指標快取，不寫入磁碟；恢復時由 PaperTrader 重新建立
+        # 有日誌時權益曲線不進狀態檔 (PaperTrader.save_state 先 flush)，狀態檔大小不隨運行時間增長
+        state = self.__dict__.copy()
+        state['indicators'] = {k: v for k, v in self.indicators.__dict__.items() if k != 'strategy'}
+        if self.equity_path is not None:
+            state['_times'], state['_equity'] = [], []
+        return state
+
+    def restore(self, strategy):
+        indicators = IncrementalSMA_ATR(strategy)
+        indicators.__dict__.update(self.indicators)
+        self.indicators = indicators
+        # 上次寫完日誌、但狀態檔還沒替換就中斷時，截掉狀態檔不知道的部分
+        if self.equity_path is not None and os.path.exists(self.equity_path):
+            size = self.logged * EQUITY_DTYPE.itemsize
+            if os.path.getsize(self.equity_path) > size:
+                os.truncate(self.equity_path, size)
+
+class PaperTrader:
+    """
+    多品種異步模擬盤
+    strategy_factory: 無參數，返回一個策略實例 (每個品種一個)
+    state_path: 狀態檔 (pickle)；存在時自動恢復，每 checkpoint_every 根K線及結束時保存
+                權益曲線追加寫入 <state_path>.<symbol>.equity，狀態檔只含帳戶與指標狀態
+    每個品種使用獨立的子帳戶 (initial_balance)，保證與單品種回測逐筆一致
+    """
+    def __init__(self, strategy_factory=StrategySMA_ATR, initial_balance=10000, fee_rate=0.001,
+                 state_path=None, checkpoint_every=1000):
+        self.strategy_factory = strategy_factory
+        self.initial_balance = initial_balance
+        self.fee_rate = fee_rate
+        self.state_path = state_path
+        self.checkpoint_every = checkpoint_every
+        self.sessions = {}
+        self.verbose = False
+        if state_path and os.path.exists(state_path):
+            self.load_state()
+
+    def session(self, symbol):
+        if symbol not in self.sessions:
+            path = self.equity_path(symbol)
+            if path and os.path.exists(path):
+                os.remove(path) # 狀態檔中沒有這個品種：舊日誌不屬於當前會話
+            self.sessions[symbol] = SymbolSession(symbol, self.strategy_factory(), self.initial_balance, self.fee_rate,
+                                                  equity_path=path)
+        return self.sessions[symbol]
+
+    def equity_path(self, symbol):
+        """品種的權益日誌路徑 (沒有 state_path 時為 None)"""
+        if not self.state_path:
+            return None
+        safe = re.sub(r'[^\w.-]', '_', symbol)
+        return f"{self.state_path}.{safe}.equity"
+
+    async def consume(self, symbol, bars):
+        """消費單一品種的異步K線流"""
+        session = self.session(symbol)
+        count = 0
+        async for bar in bars:
+            action = session.on_bar(bar)
+            if action is not None and self.verbose:
+                print(f"[{symbol}] {action} @ {bar['Close']:.2f} | balance {session.account.balance:.2f}")
+            count += 1
+            if self.state_path and count % self.checkpoint_every == 0:
+                self.save_state()
+        return count
+
+    async def run(self, streams, verbose=False):
+        """streams: {symbol: 異步K線迭代器}；所有品種在同一事件循環中並行處理"""
+        self.verbose = verbose
+        try:
+            counts = await asyncio.gather(*(self.consume(symbol, bars) for symbol, bars in streams.items()))
+        finally:
+            if self.state_path:
+                self.save_state()
+        return dict(zip(streams, counts))
+
+    def save_state(self):
+        """
+        原子寫入：先寫臨時檔再替換，避免中途崩潰留下損壞的狀態
+        權益日誌先追加，狀態檔記錄已寫入的行數 (恢復時據此截斷)
+        """
+        for session in self.sessions.values():
+            session.flush()
+        tmp = f"{self.state_path}.tmp"
+        with open(tmp, 'wb') as f:
+            pickle.dump(self.sessions, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, self.state_path)
+
+    def load_state(self):
+        with open(self.state_path, 'rb') as f:
+            self.sessions = pickle.load(f)
+        for session in self.sessions.values():
+            session.restore(self.strategy_factory())
+        print(f"Restored paper trading state for {len(self.sessions)} symbol(s) from {self.state_path}")
+
+    def performance(self):
+        """每個品種的績效指標 dict"""
+        return {symbol: session.performance() for symbol, session in self.sessions.items()}
+
+async def replay_csv(filepath, speed=None, yield_every=1000):
+    """
+    CSV 回放為異步K線流
+    speed=None: 全速回放 (每 yield_every 根讓出一次事件循環，其他品種可並行處理)
+    speed=60: 按K線時間差的 60 倍速回放
+    CSV 在線程中載入，冷啟動解析大檔時不阻塞同一事件循環上的其他K線流
+    """
+    df = await asyncio.to_thread(DataLoader(filepath).load_data)
+    times = df.index.values.astype('datetime64[ns]').view('int64').tolist()
+    columns = [df[col].to_numpy(dtype=np.float64).tolist() for col in ('Open', 'High', 'Low', 'Close')]
+
+    for k, (t, o, h, l, c) in enumerate(zip(times, *columns)):
+        yield {'time': t, 'Open': o, 'High': h, 'Low': l, 'Close': c}
+        if speed and k + 1 < len(times):
+            await asyncio.sleep((times[k + 1] - t) / 1e9 / speed)
+        elif k % yield_every == 0:
+            await asyncio.sleep(0)
+
+def bridge_streams(bridge, symbols):
+    """
+    把 TickBridge 收盤的一分鐘K線轉成每個品種一個異步K線流
+    (bridge 在自己的線程中回調，這裡用 call_soon_threadsafe 交給事件循環)
+    需在事件循環內調用
+    """
+    loop = asyncio.get_running_loop()
+    queues = {symbol: asyncio.Queue() for symbol in symbols}
+
+    def on_bar(bar):
+        q = queues.get(bar['symbol'])
+        if q is not None:
+            loop.call_soon_threadsafe(q.put_nowait, bar)
+    bridge.on_bar = on_bar
+
+    async def stream(q):
+        while True:
+            yield await q.get()
+    return {symbol: stream(q) for symbol, q in queues.items()}
+
+def verify_replay(filepath, strategy_factory=StrategySMA_ATR, initial_balance=10000, fee_rate=0.001):
+    """CSV 回放結果與 BacktestEngine.run_fast 逐根比對 (權益曲線、交易記錄、最終餘額)"""
+    from backtester import BacktestEngine
+
+    trader = PaperTrader(strategy_factory, initial_balance, fee_rate)
+    asyncio.run(trader.run({'replay': replay_csv(filepath)}))
+    session = trader.sessions['replay']
+
+    engine = BacktestEngine(initial_balance=initial_balance, fee_rate=fee_rate)
+    curve = engine.run_fast(DataLoader(filepath).load_data(), strategy_factory())
+
+    return (np.array_equal(session.equity, curve['equity'].to_numpy())
+            and np.array_equal(session.account.trades.array, engine.trades.array)
+            and session.account.balance == engine.balance)
+
+async def _run_live(trader, socket_path, symbols, verbose):
+    from stream_bridge import TickBridge
+
+    # 不傳 on_signal：橋接只合成K線，指標與信號只在模擬盤中計算一次
+    bridge = TickBridge(socket_path).start()
+    try:
+        await trader.run(bridge_streams(bridge, symbols), verbose=verbose)
+    finally:
+        bridge.stop()
+
+def main():
+    parser = argparse.ArgumentParser(description='Async paper trading (CSV replay or live bridge)')
+    parser.add_argument('--replay', nargs='+', metavar='SYMBOL=CSV', help='replay CSV files, e.g. BTCUSDT=btc.csv')
+    parser.add_argument('--live', nargs='+', metavar='SYMBOL', help='consume live bars from the Go collector bridge')
+    parser.add_argument('--socket', default=os.environ.get('CRYPTO_BRIDGE_SOCKET', '/tmp/crypto_ticks.sock'))
+    parser.add_argument('--speed', type=float, default=None, help='replay speed multiplier (default: as fast as possible)')
+    parser.add_argument('--state', default=None, help='state file for resume')
+    parser.add_argument('--balance', type=float, default=10000)
+    parser.add_argument('--fee', type=float, default=0.001)
+    parser.add_argument('--verify', action='store_true', help='check replay against BacktestEngine.run_fast')
+    parser.add_argument('--verbose', action='store_true')
+    args = parser.parse_args()
+
+    if args.verify:
+        for item in args.replay or []:
+            filepath = item.split('=', 1)[-1]
+            print(f"{filepath}: {'MATCH' if verify_replay(filepath, initial_balance=args.balance, fee_rate=args.fee) else 'MISMATCH'}")
+        return
+
+    trader = PaperTrader(initial_balance=args.balance, fee_rate=args.fee, state_path=args.state)
+    try:
+        if args.replay:
+            streams = {}
+            for item in args.replay:
+                symbol, _, filepath = item.rpartition('=')
+                streams[symbol or filepath] = replay_csv(filepath, speed=args.speed)
+            asyncio.run(trader.run(streams, verbose=args.verbose))
+        elif args.live:
+            asyncio.run(_run_live(trader, args.socket, args.live, args.verbose))
+        else:
+            parser.error('either --replay or --live is required')
+    except KeyboardInterrupt:
+        pass
+
+    for symbol, metrics in trader.performance().items():
+        print(f"[{symbol}] Final Equity ${metrics['final_equity']:.2f} | Return {metrics['total_return']:.2f}% | "
+              f"Trades {metrics['trades']} | Win Rate {metrics['win_rate']:.2f}%")
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
@@ -0,0 +1,128 @@
+"""
+大數據量回測圖表 (數百萬根K線)
+
+- 按圖表像素寬度降採樣：minmax 每個像素桶保留最低/最高點 (回撤尖刺不會被平滑掉)，
+  lttb 為 Largest-Triangle-Three-Buckets (視覺形狀最接近原曲線)
+- 買賣點標記各用一次 scatter 批量繪製
+- 給出 path 時使用 Agg 後端直接寫入檔案 (不需要 GUI，可在伺服器上批量輸出報告)
+"""
+import numpy as np
+from matplotlib.figure import Figure
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+
+DECIMATE_METHODS = ('minmax', 'lttb')
+
+def minmax_indices(y, n_buckets):
+    """每個桶保留最小值與最大值的位置 (按時間順序)，返回排序後的索引 (含首尾)"""
+    y = np.asarray(y, dtype=np.float64)
+    n = len(y)
+    if n <= 2 * n_buckets:
+        return np.arange(n)
+
+    size = -(-n // n_buckets) # 每個桶的K線數 (向上取整)
+    padded = np.empty(size * n_buckets, dtype=np.float64)
+    padded[:n] = y
+    padded[n:] = y[-1] # 用最後一個值填充，不影響最小/最大值
+    blocks = padded.reshape(n_buckets, size)
+
+    offsets = np.arange(n_buckets) * size
+    lo = offsets + blocks.argmin(axis=1)
+    hi = offsets + blocks.argmax(axis=1)
+    idx = np.unique(np.concatenate(([0, n - 1], lo, hi)))
+    return idx[idx < n]
+
+def lttb_indices(y, n_out):
+    """Largest-Triangle-Three-Buckets：每個桶選出與前一選點、下一桶均值構成最大三角形的點"""
+    y = np.asarray(y, dtype=np.float64)
+    n = len(y)
+    if n <= n_out or n_out < 3:
+        return np.arange(n)
+
+    x = np.arange(n, dtype=np.float64) # 等距K線，用位置作為 x
+    edges = np.linspace(1, n - 1, n_out - 1).astype(np.int64)
+    out = np.empty(n_out, dtype=np.int64)
+    out[0], out[-1] = 0, n - 1
+    a = 0
+    for k in range(n_out - 2):
+        start, end = edges[k], edges[k + 1]
+        nxt_end = edges[k + 2] if k + 2 < len(edges) else n
+        avg_x = x[end:nxt_end].mean() if nxt_end > end else x[-1]
+        avg_y = y[end:nxt_end].mean() if nxt_end > end else y[-1]
+        area = np.abs((x[a] - avg_x) * (y[start:end] - y[a]) - (x[a] - x[start:end]) * (avg_y - y[a]))
+        a = start + int(area.argmax()) if end > start else start
+        out[k + 1] = a
+    return np.unique(out)
+
+def decimate(values, width_px, method='minmax'):
+    """按像素寬度降採樣，返回保留點的索引"""
+    if method == 'minmax':
+        return minmax_indices(values, max(int(width_px), 1))
+    if method == 'lttb':
+        return lttb_indices(values, max(int(width_px) * 2, 3))
+    raise ValueError(f"method must be one of {DECIMATE_METHODS}")
+
+def _signal_arrays(signals):
+    """signals (list of dict) -> {type: (times, prices)}，供批量 scatter"""
+    markers = {}
+    for kind in ('BUY', 'SELL'):
+        rows = [(s['time'], s['price']) for s in signals if s['type'] == kind]
+        if rows:
+            times, prices = zip(*rows)
+            markers[kind] = (np.asarray(times, dtype='datetime64[ns]'), np.asarray(prices, dtype=np.float64))
+    return markers
+
+def plot_backtest(price_times, prices, equity_times, equity, initial_balance, signals=None, title="Backtest Result",
+                  path=None, method='minmax', figsize=(12, 8), dpi=100):
+    """
+    價格 (上) + 資金曲線 (下) 雙圖，兩條曲線都降採樣到圖表像素寬度
+    path 給出時寫入檔案並返回 path；否則返回 Figure (由調用者決定 show/savefig)
+    """
+    price_times = np.asarray(price_times, dtype='datetime64[ns]')
+    equity_times = np.asarray(equity_times, dtype='datetime64[ns]')
+    prices = np.asarray(prices, dtype=np.float64)
+    equity = np.asarray(equity, dtype=np.float64)
+    width_px = figsize[0] * dpi
+
+    p_idx = decimate(prices, width_px, method)
+    e_idx = decimate(equity, width_px, method)
+    eq_t, eq_v = equity_times[e_idx], equity[e_idx]
+
+    # 找出第一個「歸零」的時間點 (在完整曲線上找，不受降採樣影響)
+    busted = np.flatnonzero(equity <= 0)
+    bust_date = equity_times[busted[0]] if len(busted) else None
+
+    if path is not None:
+        fig = Figure(figsize=figsize, dpi=dpi)
+        FigureCanvasAgg(fig)
+    else:
+        import matplotlib.pyplot as plt
+        fig = plt.figure(figsize=figsize, dpi=dpi)
+    ax1, ax2 = fig.subplots(2, 1, sharex=True, gridspec_kw={'height_ratios': [2, 1]})
+
+    # 上圖：價格 + 買賣點 (每種標記一次 scatter)
+    ax1.plot(price_times[p_idx], prices[p_idx], label='BTC Price', color='gray', alpha=0.5)
+    for kind, (times, values) in _signal_arrays(signals or []).items():
+        marker, color = ('^', 'green') if kind == 'BUY' else ('v', 'red')
+        ax1.scatter(times, values, marker=marker, color=color, s=30, zorder=5, label=kind)
+    ax1.set_title(f'{title} - Market Trend')
+    ax1.set_ylabel('Price')
+    ax1.grid(True, alpha=0.3)
+    if bust_date is not None:
+        ax1.axvline(bust_date, color='red', linestyle='--', label=f'Busted at {str(bust_date)[:10]}')
+    ax1.legend(loc='upper left')
+
+    # 下圖：資金曲線
+    ax2.plot(eq_t, eq_v, color='blue', linewidth=1.0, label='Equity')
+    ax2.axhline(initial_balance, linestyle='--', color='orange', alpha=0.8, label='Initial Capital')
+    ax2.fill_between(eq_t, initial_balance, eq_v, where=(eq_v >= initial_balance), facecolor='green', alpha=0.3)
+    ax2.fill_between(eq_t, initial_balance, eq_v, where=(eq_v < initial_balance), facecolor='red', alpha=0.3)
+    ax2.set_title('Equity Curve (Max Drawdown Analysis)')
+    ax2.set_ylabel('Balance ($)')
+    ax2.legend(loc='upper left')
+    ax2.grid(True, alpha=0.3)
+
+    fig.tight_layout()
+    if path is not None:
+        fig.savefig(path)
+        return path
+    return fig
\ No newline at end of file
@@ -0,0 +1,195 @@
+import time
+
+import numpy as np
+import pandas as pd
+
+from data_loader import DataLoader
+from metrics import TradeRecorder, compute_metrics
+
+def load_symbols(paths, how='inner'):
+    """讀取多個品種 ({symbol: csv_path}) 並按時間戳對齊"""
+    frames = {symbol: DataLoader(path).load_data() for symbol, path in paths.items()}
+    return align_frames(frames, how=how)
+
+def align_frames(frames, how='inner'):
+    """
+    將多個品種的 OHLCV 對齊到同一個時間索引
+    how='inner': 只保留所有品種都有數據的時間點
+    how='outer': 取時間並集，缺失K線用前值填充 (開頭仍缺失的時間點會被丟棄)
+    """
+    index = None
+    for df in frames.values():
+        if index is None:
+            index = df.index
+        elif how == 'inner':
+            index = index.intersection(df.index)
+        else:
+            index = index.union(df.index)
+
+    aligned = {symbol: df.reindex(index) for symbol, df in frames.items()}
+    if how != 'inner':
+        aligned = {symbol: df.ffill() for symbol, df in aligned.items()}
+        valid = np.logical_and.reduce([df['Close'].notna().to_numpy() for df in aligned.values()])
+        aligned = {symbol: df[valid] for symbol, df in aligned.items()}
+    return aligned
+
+class PortfolioBacktestEngine:
+    """
+    多品種組合回測：N 個品種共用一個現金餘額，各自獨立持倉
+    所有品種的 Close / 信號排成 (T, N) 陣列，每一步向量化地為全部品種搜尋下一個事件K線
+    (空倉品種的進場信號、持倉品種的 SL/TP/出場信號)，事件之間的權益整段填充
+    記帳規則 (手續費、止損止盈、技術性賣出優先) 與 BacktestEngine 相同
+    """
+    def __init__(self, initial_balance=10000, fee_rate=0.001):
+        self.initial_balance = initial_balance
+        self.balance = initial_balance
+        self.fee_rate = fee_rate
+        self.symbols = []
+        self.equity_curve = []
+        self.signals = []
+        self.trades = {}
+        self.throughput = None
+
+    def run(self, frames, strategies):
+        """
+        frames: {symbol: 已對齊的 DataFrame} (見 align_frames)
+        strategies: 單一策略實例 (所有品種共用) 或 {symbol: 策略實例}
+        """
+        self.symbols = list(frames)
+        if not isinstance(strategies, dict):
+            strategies = {symbol: strategies for symbol in self.symbols}
+
+        index = next(iter(frames.values())).index
+        T, N = len(index), len(self.symbols)
+
+        # 1. 每個品種計算指標與信號，再對齊回共同索引 (預熱期無信號)
+        close = np.empty((T, N), dtype=np.float64)
+        entries = np.zeros((T, N), dtype=bool)
+        exits = np.zeros((T, N), dtype=bool)
+        sl_distance = np.full((T, N), np.nan)
+        tp_distance = np.full((T, N), np.nan)
+        reasons = []
+        for k, symbol in enumerate(self.symbols):
+            df = frames[symbol]
+            close[:, k] = df['Close'].to_numpy(dtype=np.float64)
+            prepared = strategies[symbol].prepare_indicators(df)
+            sig = strategies[symbol].generate_signals(prepared)
+            rows = index.get_indexer(prepared.index)
+            entries[rows, k] = sig['entries']
+            exits[rows, k] = sig['exits']
+            sl_distance[rows, k] = sig['sl_distance']
+            tp_distance[rows, k] = sig['tp_distance']
+            reasons.append((sig.get('entry_reason'), sig.get('exit_reason')))
+
+        print(f"--- Running Portfolio Backtest on {T} bars x {N} symbols ---")
+        start = time.perf_counter()
+
+        self.signals = []
+        self.trades = {symbol: TradeRecorder() for symbol in self.symbols}
+        equity = np.empty(T, dtype=np.float64)
+
+        held = np.zeros(N, dtype=bool)
+        size = np.zeros(N, dtype=np.float64)
+        entry_price = np.zeros(N, dtype=np.float64)
+        entry_time = [None] * N
+        stop_loss = np.full(N, -np.inf)
+        take_profit = np.full(N, np.inf)
+        seg_start = 0
+        i = 1 # 第 0 根K線不交易
+
+        while i < T:
+            j = self._next_event(close, entries, exits, i, held, stop_loss, take_profit)
+            if j < 0: break
+
+            # 事件K線之前 (含本根) 的權益以當前持倉計算
+            self._fill_equity(equity, close, seg_start, j + 1, size)
+            seg_start = j + 1
+            i = j + 1
+            price = close[j]
+
+            # --- 出場：所有持倉品種一次向量化判斷 ---
+            hit_sl = held & (price <= stop_loss)
+            hit_tp = held & ~hit_sl & (price >= take_profit)
+            hit_sig = held & exits[j]
+            leaving = hit_sl | hit_tp | hit_sig
+            if leaving.any():
+                revenue = size * price
+                fee = revenue * self.fee_rate
+                pnl = (revenue - fee) - (entry_price * size * (1 + self.fee_rate))
+                for k in np.flatnonzero(leaving):
+                    self.balance += float(revenue[k] - fee[k])
+                    reason = reasons[k][1] if hit_sig[k] else ("Stop Loss" if hit_sl[k] else "Take Profit")
+                    self.signals.append({'time': index[j], 'symbol': self.symbols[k], 'price': float(price[k]), 'type': 'SELL', 'reason': reason})
+                    self.trades[self.symbols[k]].append(entry_time[k], index[j], float(entry_price[k]), float(price[k]), float(size[k]), float(pnl[k]))
+                held[leaving] = False
+                size[leaving] = 0.0
+                stop_loss[leaving] = -np.inf
+                take_profit[leaving] = np.inf
+
+            # --- 進場：本根未出場的空倉品種，按品種順序共用現金 ---
+            entering = ~held & ~leaving & entries[j]
+            for k in np.flatnonzero(entering):
+                p = float(price[k])
+                sl_dist = float(sl_distance[j, k])
+                qty = strategies[self.symbols[k]].position_size(self.balance, p, sl_dist, self.fee_rate)
+                if qty > 0:
+                    cost = qty * p
+                    fee = cost * self.fee_rate
+                    if self.balance >= (cost + fee):
+                        self.balance -= (cost + fee)
+                        held[k] = True
+                        size[k] = qty
+                        entry_price[k] = p
+                        entry_time[k] = index[j]
+                        stop_loss[k] = p - sl_dist
+                        take_profit[k] = p + float(tp_distance[j, k])
+                        self.signals.append({'time': index[j], 'symbol': self.symbols[k], 'price': p, 'type': 'BUY', 'reason': reasons[k][0]})
+
+        self._fill_equity(equity, close, seg_start, T, size)
+
+        elapsed = time.perf_counter() - start
+        self.throughput = T * N / elapsed if elapsed > 0 else float('inf')
+        print(f"Throughput: {self.throughput:,.0f} bar-symbols/sec ({elapsed:.2f}s)")
+
+        self.equity_curve = pd.DataFrame({'time': index, 'equity': equity})
+        return self.equity_curve.set_index('time')
+
+    def _fill_equity(self, equity, close, start, end, size):
+        """權益 = 現金 + Σ(持倉市值 - 預估平倉手續費)"""
+        if start >= end:
+            return
+        if not size.any():
+            equity[start:end] = self.balance
+            return
+        mkt_value = close[start:end] * size
+        equity[start:end] = self.balance + (mkt_value - mkt_value * self.fee_rate).sum(axis=1)
+
+    @staticmethod
+    def _next_event(close, entries, exits, start, held, stop_loss, take_profit, block=1024):
+        """分塊向量化搜尋所有品種中的下一根事件K線，找不到返回 -1"""
+        T = len(close)
+        while start < T:
+            end = min(start + block, T)
+            window = close[start:end]
+            hit = np.where(held,
+                           (window <= stop_loss) | (window >= take_profit) | exits[start:end],
+                           entries[start:end]).any(axis=1)
+            pos = int(hit.argmax())
+            if hit[pos]:
+                return start + pos
+            start = end
+            block *= 2
+        return -1
+
+    def performance(self):
+        """組合層面的績效指標 (dict)"""
+        pnl = np.concatenate([t.pnl for t in self.trades.values()]) if self.trades else np.empty(0)
+        if len(self.equity_curve) == 0:
+            return compute_metrics([], pnl, self.initial_balance)
+        times = self.equity_curve['time'].to_numpy().astype('datetime64[ns]').view('int64')
+        trades = np.concatenate([t.array for t in self.trades.values()])
+        metrics = compute_metrics(self.equity_curve['equity'].to_numpy(), pnl, self.initial_balance,
+                                  times=times, trades=trades)
+        metrics['exposure'] /= max(len(self.symbols), 1) # 各品種平均持倉比例
+        metrics['throughput'] = self.throughput
+        return metrics
\ No newline at end of file
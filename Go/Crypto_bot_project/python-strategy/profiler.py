@@ -0,0 +1,178 @@
+"""
+回測流水線的分階段計時 / 記憶體 / cProfile 工具 (預設關閉，不影響正常運行)
+
+用法:
+    profiler = RunProfiler(memory=True, cprofile=['bar_loop'])
+    loader = DataLoader(path, profiler=profiler)
+    engine = BacktestEngine(profiler=profiler)
+    ...
+    profiler.write('run_report.json', performance=engine.performance())
+
+各模組內以 `with self.profiler.stage('name', bars=n):` 包住耗時階段；
+同名階段多次執行 (例如參數掃描、串流分塊) 會累加，報告中給出次數、總耗時與 bars/sec
+"""
+import os
+import sys
+import json
+import time
+import pstats
+import cProfile
+import platform
+import contextlib
+import tracemalloc
+
+def _rss_mb():
+    """當前進程常駐記憶體 (MB)；非 Linux 時退回峰值 RSS"""
+    try:
+        with open('/proc/self/statm', 'r') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / 1024 / 1024
+    except (OSError, ValueError, AttributeError):
+        pass
+    try:
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak / 1024 / 1024 if sys.platform == 'darwin' else peak / 1024
+    except ImportError:
+        return None
+
+class RunProfiler:
+    """
+    enabled: False 時所有 stage() 都是空操作
+    memory: 以 tracemalloc 記錄每個階段的 Python 分配峰值 (有額外開銷，只在排查時開啟)
+    cprofile: 需要 cProfile 的階段名稱 (例如 ['bar_loop'])，True 代表全部階段；
+              嵌套時只剖析最外層被選中的階段
+    """
+    def __init__(self, enabled=True, memory=False, cprofile=None, name=None):
+        self.enabled = enabled
+        self.memory = memory
+        self.cprofile = cprofile
+        self.name = name
+        self.stages = {} # name -> 累計統計 (按首次出現順序)
+        self.profiles = {} # name -> cProfile.Profile
+        self.created = time.strftime('%Y-%m-%dT%H:%M:%S')
+        self._start = time.perf_counter()
+        self._depth = 0
+        self._peaks = [] # 嵌套階段的 tracemalloc 峰值堆疊
+        self._profiling = False # 已有 cProfile 在運行 (同一時間只能啟用一個)
+
+    def _profiled(self, name):
+        return self.cprofile is True or (self.cprofile and name in self.cprofile)
+
+    @contextlib.contextmanager
+    def stage(self, name, bars=None):
+        """計時一個階段；bars 為該階段處理的K線數 (用於 bars/sec)"""
+        if not self.enabled:
+            yield
+            return
+
+        tracing = self.memory and not tracemalloc.is_tracing()
+        if tracing:
+            tracemalloc.start()
+        elif self.memory:
+            # 嵌套階段：先把外層到目前為止的峰值存起來，再重置以單獨記錄內層峰值
+            if self._peaks:
+                self._peaks[-1] = max(self._peaks[-1], tracemalloc.get_traced_memory()[1])
+            tracemalloc.reset_peak()
+        if self.memory:
+            self._peaks.append(0)
+        profile = None
+        if self._profiled(name) and not self._profiling:
+            # 只剖析最外層的階段：內層階段已包含在外層的剖析結果中，
+            # 而且 Python 3.12+ 不允許同時啟用第二個 cProfile
+            profile = self.profiles.setdefault(name, cProfile.Profile())
+            profile.enable()
+            self._profiling = True
+
+        self._depth += 1
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            self._depth -= 1
+            if profile is not None:
+                profile.disable()
+                self._profiling = False
+            peak_mb = None
+            if self.memory:
+                peak = max(tracemalloc.get_traced_memory()[1], self._peaks.pop())
+                if self._peaks:
+                    self._peaks[-1] = max(self._peaks[-1], peak)
+                peak_mb = peak / 1024 / 1024
+                if tracing:
+                    tracemalloc.stop()
+            self._record(name, elapsed, bars, peak_mb)
+
+    def _record(self, name, elapsed, bars, peak_mb):
+        s = self.stages.get(name)
+        if s is None:
+            s = self.stages[name] = {'calls': 0, 'seconds': 0.0, 'bars': 0, 'depth': self._depth,
+                                     'rss_mb': None, 'peak_mb': None}
+        s['calls'] += 1
+        s['seconds'] += elapsed
+        if bars is not None:
+            s['bars'] += int(bars)
+        s['bars_per_sec'] = s['bars'] / s['seconds'] if s['bars'] and s['seconds'] > 0 else None
+        rss = _rss_mb()
+        if rss is not None:
+            s['rss_mb'] = rss if s['rss_mb'] is None else max(s['rss_mb'], rss)
+        if peak_mb is not None:
+            s['peak_mb'] = peak_mb if s['peak_mb'] is None else max(s['peak_mb'], peak_mb)
+
+    def add_bars(self, name, bars):
+        """階段結束後才知道K線數時補記"""
+        if self.enabled and name in self.stages:
+            s = self.stages[name]
+            s['bars'] += int(bars)
+            s['bars_per_sec'] = s['bars'] / s['seconds'] if s['seconds'] > 0 else None
+
+    def throughput(self, name):
+        s = self.stages.get(name)
+        return s['bars_per_sec'] if s else None
+
+    def _top_functions(self, profile, limit=20):
+        stats = pstats.Stats(profile)
+        rows = sorted(stats.stats.items(), key=lambda item: item[1][3], reverse=True)[:limit]
+        return [{'function': f"{os.path.basename(file)}:{line}({func})", 'calls': nc, 'tottime': tt, 'cumtime': ct}
+                for (file, line, func), (_, nc, tt, ct, _) in rows]
+
+    def report(self, performance=None, extra=None):
+        """結構化運行報告 (dict)"""
+        report = {
+            'name': self.name,
+            'created': self.created,
+            'wall_seconds': time.perf_counter() - self._start,
+            'python': platform.python_version(),
+            'machine': platform.machine(),
+            'rss_mb': _rss_mb(),
+            'stages': self.stages,
+            'cprofile': {name: self._top_functions(p) for name, p in self.profiles.items()},
+        }
+        if performance is not None:
+            report['performance'] = performance
+        if extra:
+            report.update(extra)
+        return report
+
+    def write(self, path, performance=None, extra=None):
+        """寫出 JSON 報告；有 cProfile 時另存 <path>.<stage>.prof (可用 snakeviz / pstats 打開)"""
+        report = self.report(performance, extra)
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2, default=str)
+        for name, profile in self.profiles.items():
+            profile.dump_stats(f"{path}.{name}.prof")
+        print(f"Run report written to {path}")
+        return report
+
+    def print_summary(self):
+        if not self.stages:
+            return
+        print(f"{'stage':<22} {'calls':>6} {'seconds':>10} {'bars/sec':>14} {'rss MB':>9} {'peak MB':>9}")
+        for name, s in self.stages.items():
+            bps = f"{s['bars_per_sec']:,.0f}" if s['bars_per_sec'] else '-'
+            rss = f"{s['rss_mb']:.1f}" if s['rss_mb'] is not None else '-'
+            peak = f"{s['peak_mb']:.1f}" if s['peak_mb'] is not None else '-'
+            print(f"{'  ' * s['depth'] + name:<22} {s['calls']:>6} {s['seconds']:>10.4f} {bps:>14} {rss:>9} {peak:>9}")
+
+# 預設的空操作 profiler (各模組未傳入 profiler 時使用)
+NULL_PROFILER = RunProfiler(enabled=False)
\ No newline at end of file
@@ -0,0 +1,62 @@
+import numpy as np
+import pandas as pd
+
+def _bin_edges(epoch, step_ns):
+    """按固定寬度分桶 (對齊 epoch 零點，與 pandas resample 的預設對齊一致)，返回每桶起始位置與桶標籤"""
+    bins = epoch // step_ns
+    starts = np.flatnonzero(np.diff(bins)) + 1
+    starts = np.concatenate(([0], starts))
+    return starts, bins[starts] * step_ns
+
+def resample_ohlcv(df, rule):
+    """
+    一分鐘K線聚合為更高週期 (Open=第一根, High=最大, Low=最小, Close=最後一根, Volume=加總)
+    K線以區間起點標記 [t, t+rule)，沒有數據的區間不產生K線
+    使用 np.*.reduceat 一次聚合，比 DataFrame.resample().agg() 快得多；需按時間排序
+    聚合只取原值 (首/尾/最大/最小)，lean 數據的 attrs['price_decimals'] 仍然有效，一併保留
+    """
+    step_ns = pd.Timedelta(rule).value
+    if len(df) == 0:
+        return df.iloc[:0]
+
+    epoch = df.index.values.astype('datetime64[ns]').view('int64')
+    starts, labels = _bin_edges(epoch, step_ns)
+    ends = np.concatenate((starts[1:], [len(df)])) - 1
+
+    out = {}
+    if 'Timestamp' in df.columns:
+        out['Timestamp'] = df['Timestamp'].to_numpy()[starts]
+    if 'Open' in df.columns:
+        out['Open'] = df['Open'].to_numpy()[starts]
+    if 'High' in df.columns:
+        out['High'] = np.maximum.reduceat(df['High'].to_numpy(), starts)
+    if 'Low' in df.columns:
+        out['Low'] = np.minimum.reduceat(df['Low'].to_numpy(), starts)
+    out['Close'] = df['Close'].to_numpy()[ends]
+    if 'Volume' in df.columns:
+        out['Volume'] = np.add.reduceat(df['Volume'].to_numpy(), starts)
+
+    index = pd.DatetimeIndex(labels.view('datetime64[ns]'), name=df.index.name).astype(df.index.dtype)
+    bars = pd.DataFrame(out, index=index)
+    bars.attrs.update(df.attrs)
+    return bars
+
+def align_to_base(htf, base_index, rule, base_step='1min'):
+    """
+    把高週期數據 (指標或K線) 對齊回一分鐘索引，不含未來函數：
+    標記為 t 的高週期K線在 t + rule - base_step 這根一分鐘K線收盤時才完成，
+    因此每根一分鐘K線只能看到「已完成」的最新一根高週期K線，之前為 NaN
+    """
+    available = htf.index.values.astype('datetime64[ns]').view('int64') + \
+        (pd.Timedelta(rule) - pd.Timedelta(base_step)).value
+    base = pd.DatetimeIndex(base_index).values.astype('datetime64[ns]').view('int64')
+    pos = np.searchsorted(available, base, side='right') - 1
+
+    values = htf.to_numpy()
+    aligned = np.full((len(base),) + values.shape[1:], np.nan)
+    valid = pos >= 0
+    aligned[valid] = values[pos[valid]]
+
+    if isinstance(htf, pd.DataFrame):
+        return pd.DataFrame(aligned, index=base_index, columns=htf.columns)
+    return pd.Series(aligned, index=base_index, name=htf.name)
\ No newline at end of file
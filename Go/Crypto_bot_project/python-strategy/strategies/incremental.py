@@ -0,0 +1,133 @@
+import math
+
+class RollingMean:
+    """
+    O(1) 滾動均值 (環形緩衝區)
+    逐步複製 pandas rolling().mean() 的 Kahan 補償加減法，使增量結果與批量計算逐根一致
+    """
+    def __init__(self, window):
+        self.window = window
+        self._buffer = [0.0] * window
+        self._head = 0 # 下一個寫入位置 (也是最舊值的位置)
+        self.nobs = 0
+        self._sum = 0.0
+        self._comp_add = 0.0
+        self._comp_remove = 0.0
+        self._neg_ct = 0
+        self._same_ct = 0
+        self._prev_value = None
+        self.value = math.nan
+
+    def update(self, x):
+        """加入一個新值，返回當前均值 (窗口未滿時為 NaN)"""
+        if self.nobs == self.window:
+            # 先移除最舊的值
+            old = self._buffer[self._head]
+            self.nobs -= 1
+            y = -old - self._comp_remove
+            t = self._sum + y
+            self._comp_remove = t - self._sum - y
+            self._sum = t
+            if math.copysign(1.0, old) < 0: self._neg_ct -= 1
+
+        # 再加入新值
+        self._buffer[self._head] = x
+        self._head = (self._head + 1) % self.window
+        if self._prev_value is None:
+            self._prev_value = x
+        self.nobs += 1
+        y = x - self._comp_add
+        t = self._sum + y
+        self._comp_add = t - self._sum - y
+        self._sum = t
+        if math.copysign(1.0, x) < 0: self._neg_ct += 1
+        if x == self._prev_value:
+            self._same_ct += 1
+        else:
+            self._same_ct = 1
+        self._prev_value = x
+
+        if self.nobs < self.window:
+            self.value = math.nan
+        else:
+            result = self._sum / self.nobs
+            if self._same_ct >= self.nobs: result = self._prev_value
+            elif self._neg_ct == 0 and result < 0: result = 0.0
+            elif self._neg_ct == self.nobs and result > 0: result = 0.0
+            self.value = result
+        return self.value
+
+class RollingATR:
+    """O(1) ATR：真實波幅 max(H-L, |H-prevC|, |L-prevC|) 的滾動均值"""
+    def __init__(self, period):
+        self._mean = RollingMean(period)
+        self._prev_close = None
+        self.value = math.nan
+
+    def update(self, high, low, close):
+        high_low = high - low
+        if self._prev_close is None:
+            true_range = high_low # 第一根K線沒有前收盤價
+        else:
+            true_range = max(high_low, abs(high - self._prev_close), abs(low - self._prev_close))
+        self._prev_close = close
+        self.value = self._mean.update(true_range)
+        return self.value
+
+class CrossoverState:
+    """快慢線交叉狀態：記住上一根的快慢線，判斷金叉/死叉"""
+    def __init__(self):
+        self.prev_fast = math.nan
+        self.prev_slow = math.nan
+        self.state = None
+
+    def update(self, fast, slow):
+        if self.prev_fast < self.prev_slow and fast > slow:
+            self.state = 'golden'
+        elif self.prev_fast > self.prev_slow and fast < slow:
+            self.state = 'death'
+        else:
+            self.state = None
+        self.prev_fast, self.prev_slow = fast, slow
+        return self.state
+
+class IncrementalSMA_ATR:
+    """
+    StrategySMA_ATR 的增量版指標引擎 (實盤逐根K線使用)
+    每根新K線 O(1) 更新 SMA_Fast / SMA_Slow / ATR，結果與 prepare_indicators 逐根一致；
+    指標預熱完成後，signal() 以字典行調用 strategy.get_signal，得到與回測相同的交易指令
+    """
+    def __init__(self, strategy):
+        self.strategy = strategy
+        self.sma_fast = RollingMean(strategy.fast_period)
+        self.sma_slow = RollingMean(strategy.slow_period)
+        self.atr = RollingATR(strategy.atr_period)
+        self.cross = CrossoverState()
+        self.curr_row = None
+        self.prev_row = None
+
+    @property
+    def is_ready(self):
+        """當前與上一根K線的指標都已預熱完成"""
+        return self.curr_row is not None and self.prev_row is not None
+
+    def update(self, high, low, close, timestamp=None):
+        """輸入一根已收盤的K線，返回當前指標行 (預熱未完成時返回 None)"""
+        fast = self.sma_fast.update(close)
+        slow = self.sma_slow.update(close)
+        atr = self.atr.update(high, low, close)
+        self.cross.update(fast, slow)
+
+        row = {'time': timestamp, 'Close': close, 'SMA_Fast': fast, 'SMA_Slow': slow, 'ATR': atr}
+        if math.isnan(fast) or math.isnan(slow) or math.isnan(atr):
+            # 與 prepare_indicators 的 dropna 一致：未預熱的K線不參與信號
+            self.curr_row = self.prev_row = None
+            return None
+        self.prev_row, self.curr_row = self.curr_row, row
+        return row
+
+    def signal(self, balance, fee_rate):
+        """與 get_signal 相同的返回值：(Action, Size, StopLoss, TakeProfit, Reason)"""
+        if not self.is_ready:
+            return 'HOLD', 0, 0, 0, None
+        return self.strategy.get_signal(self.curr_row, self.prev_row, balance, fee_rate)
\ No newline at end of file
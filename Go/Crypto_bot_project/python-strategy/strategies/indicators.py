@@ -0,0 +1,101 @@
+import hashlib
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+class IndicatorCache:
+    """
+    指標記憶化快取 (LRU + 記憶體上限)
+    key = (數據指紋, 指標名稱, 參數)，value 為唯讀 NumPy 陣列
+    同一份數據上相同的 rolling mean / ATR 只會計算一次，策略實例與參數掃描之間共用
+    """
+    def __init__(self, max_bytes=512 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._store = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_or_compute(self, key, compute):
+        with self._lock:
+            arr = self._store.get(key)
+            if arr is not None:
+                self._store.move_to_end(key)
+                self.hits += 1
+                return arr
+            self.misses += 1
+
+        arr = np.ascontiguousarray(compute())
+        arr.setflags(write=False)
+
+        with self._lock:
+            if key not in self._store and arr.nbytes <= self.max_bytes:
+                self._store[key] = arr
+                self.nbytes += arr.nbytes
+                # 超出上限時淘汰最久未使用的項目
+                while self.nbytes > self.max_bytes:
+                    _, old = self._store.popitem(last=False)
+                    self.nbytes -= old.nbytes
+                    self.evictions += 1
+        return arr
+
+    def clear(self):
+        with self._lock:
+            self._store.clear()
+            self.nbytes = 0
+
+    def stats(self):
+        """命中/未命中/淘汰計數與當前佔用"""
+        return {'hits': self.hits, 'misses': self.misses, 'evictions': self.evictions,
+                'entries': len(self._store), 'nbytes': self.nbytes}
+
+# 進程內共用的預設快取
+DEFAULT_CACHE = IndicatorCache()
+
+# 數據指紋涵蓋的價格欄位 (指標只用到這些欄位)
+FINGERPRINT_COLUMNS = ('High', 'Low', 'Close')
+
+def dataset_fingerprint(df):
+    """
+    數據指紋：長度 + 時間索引 + High/Low/Close 的全部值 (BLAKE2b)
+    必須雜湊每一個值：只抽樣時，改動未被抽到的K線會得到相同指紋並誤用舊指標
+    """
+    digest = hashlib.blake2b(str(len(df)).encode(), digest_size=20)
+    if len(df):
+        digest.update(np.ascontiguousarray(df.index.values.astype('datetime64[ns]').view('int64')).data)
+        for col in FINGERPRINT_COLUMNS:
+            if col in df.columns:
+                digest.update(col.encode())
+                digest.update(np.ascontiguousarray(df[col].to_numpy()).data)
+    return digest.hexdigest()
+
+def sma(df, window, column='Close', cache=DEFAULT_CACHE, fingerprint=None):
+    """簡單移動平均 (與 df[column].rolling(window).mean() 完全一致)"""
+    fingerprint = fingerprint or dataset_fingerprint(df)
+    return cache.get_or_compute(
+        (fingerprint, 'sma', column, window),
+        lambda: df[column].rolling(window=window).mean().to_numpy())
+
+def true_range(df, cache=DEFAULT_CACHE, fingerprint=None):
+    """真實波幅 max(H-L, |H-prevC|, |L-prevC|)，不同 ATR 週期共用"""
+    fingerprint = fingerprint or dataset_fingerprint(df)
+
+    def compute():
+        high_low = df['High'] - df['Low']
+        high_close = np.abs(df['High'] - df['Close'].shift())
+        low_close = np.abs(df['Low'] - df['Close'].shift())
+        ranges = pd.concat([high_low, high_close, low_close], axis=1)
+        return np.max(ranges, axis=1).to_numpy()
+
+    return cache.get_or_compute((fingerprint, 'true_range'), compute)
+
+def atr(df, period, cache=DEFAULT_CACHE, fingerprint=None):
+    """ATR = 真實波幅的簡單移動平均"""
+    fingerprint = fingerprint or dataset_fingerprint(df)
+    return cache.get_or_compute(
+        (fingerprint, 'atr', period),
+        lambda: pd.Series(true_range(df, cache, fingerprint)).rolling(window=period).mean().to_numpy())
\ No newline at end of file
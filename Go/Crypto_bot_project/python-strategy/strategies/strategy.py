@@ -1,30 +1,154 @@
 import pandas as pd
 import numpy as np
+from indicators import DEFAULT_CACHE, FINGERPRINT_COLUMNS, dataset_fingerprint, sma, atr
+
+def price_fingerprint(df):
+    """價格數據指紋：float32 數據直接雜湊原始值 (不先還原)，並帶上還原用的小數位數"""
+    fingerprint = dataset_fingerprint(df)
+    decimals = df.attrs.get('price_decimals')
+    return fingerprint if decimals is None else f"{fingerprint}:{decimals}"
+
+def price_frame(df, columns=('Open', 'High', 'Low', 'Close'), cache=None, fingerprint=None):
+    """
+    指定價格欄位的 DataFrame (copy=False)
+    float32 價格按 df.attrs['price_decimals'] 還原為原始 float64 值 (DataLoader 載入時已逐值驗證可精確還原)，
+    已是 float64 的欄位直接使用視圖
+    傳入 cache 時，指紋涵蓋的欄位 (High/Low/Close) 的還原結果按數據快取，多個策略/變體只還原一次
+    """
+    decimals = df.attrs.get('price_decimals')
+    out = {}
+    for col in columns:
+        if col not in df.columns:
+            continue
+        values = df[col].to_numpy()
+        if values.dtype == np.float32 and decimals is not None:
+            def restore(values=values):
+                restored = values.astype(np.float64)
+                return np.round(restored, decimals, out=restored)
+            if cache is not None and col in FINGERPRINT_COLUMNS:
+                key = (fingerprint or price_fingerprint(df), 'price', col)
+                values = cache.get_or_compute(key, restore)
+            else:
+                values = restore()
+        out[col] = values
+    return pd.DataFrame(out, index=df.index, copy=False)
 
 class StrategySMA_ATR:
-    def __init__(self, fast_period=20, slow_period=50, atr_period=14, risk_per_trade=0.03):
+    def __init__(self, fast_period=20, slow_period=50, atr_period=14, risk_per_trade=0.03, indicator_cache=None,
+                 lean=False, sl_atr_mult=2.0, tp_atr_mult=3.0):
         self.fast_period = fast_period
         self.slow_period = slow_period
         self.atr_period = atr_period
         self.risk_per_trade = risk_per_trade
+        # 止損 / 止盈距離 = ATR 倍數
+        self.sl_atr_mult = sl_atr_mult
+        self.tp_atr_mult = tp_atr_mult
+        # 預設使用進程內共用快取，同一份數據上相同週期的指標只計算一次
+        self.indicator_cache = indicator_cache or DEFAULT_CACHE
+        # lean: prepare_indicators 不複製原始數據 (見 DataLoader(lean=True))
+        self.lean = lean
+
+    @property
+    def warmup_bars(self):
+        """指標完全預熱所需的K線數 (ATR 需要前一根收盤價，信號需要前一根指標值)"""
+        return max(self.fast_period, self.slow_period, self.atr_period + 1) + 1
 
     def prepare_indicators(self, df):
-        """預先計算所有指標 (向量化計算，速度快)"""
+        """預先計算所有指標 (向量化計算 + 記憶化快取)"""
+        cache = self.indicator_cache
+        if self.lean:
+            return self._lean_indicators(df, cache)
+
+        # lean 數據交給非 lean 策略時，float32 價格先精確還原，指標與回測結果與 float64 數據一致
+        # (指紋與 lean 路徑相同，兩條路徑共用快取中的指標)
+        fingerprint = price_fingerprint(df)
+
         df = df.copy()
+        if df.attrs.get('price_decimals') is not None:
+            for col, values in price_frame(df).items():
+                df[col] = values
         # SMA
-        df['SMA_Fast'] = df['Close'].rolling(window=self.fast_period).mean()
-        df['SMA_Slow'] = df['Close'].rolling(window=self.slow_period).mean()
+        df['SMA_Fast'] = sma(df, self.fast_period, cache=cache, fingerprint=fingerprint)
+        df['SMA_Slow'] = sma(df, self.slow_period, cache=cache, fingerprint=fingerprint)
         
         # ATR
-        high_low = df['High'] - df['Low']
-        high_close = np.abs(df['High'] - df['Close'].shift())
-        low_close = np.abs(df['Low'] - df['Close'].shift())
-        ranges = pd.concat([high_low, high_close, low_close], axis=1)
-        true_range = np.max(ranges, axis=1)
-        df['ATR'] = true_range.rolling(window=self.atr_period).mean()
+        df['ATR'] = atr(df, self.atr_period, cache=cache, fingerprint=fingerprint)
         
         return df.dropna()
 
+    def _lean_indicators(self, df, cache):
+        """
+        不複製整個 DataFrame：價格欄位與快取中的指標陣列以 copy=False 組成新 DataFrame
+        只還原指標需要的 High/Low/Close (見 price_frame，按數據快取，多個策略共用一份)，
+        float32 價格精確還原，因此指標與回測結果與 float64 路徑完全一致；
+        Open 保持原始 dtype，intrabar 模式用到時由回測引擎按 attrs['price_decimals'] 還原
+        指標的 NaN 只出現在預熱期開頭，去掉時只做切片；中間仍有 NaN 時才退回布林過濾
+        """
+        fingerprint = price_fingerprint(df)
+        base = price_frame(df, ('High', 'Low', 'Close'), cache=cache, fingerprint=fingerprint)
+        fast = sma(base, self.fast_period, cache=cache, fingerprint=fingerprint)
+        slow = sma(base, self.slow_period, cache=cache, fingerprint=fingerprint)
+        atr_values = atr(base, self.atr_period, cache=cache, fingerprint=fingerprint)
+
+        columns = {'Open': df['Open'].to_numpy()} if 'Open' in df.columns else {}
+        columns.update((col, base[col].to_numpy()) for col in base.columns)
+        columns.update(SMA_Fast=fast, SMA_Slow=slow, ATR=atr_values)
+        out = pd.DataFrame(columns, index=df.index, copy=False)
+        if 'price_decimals' in df.attrs:
+            out.attrs['price_decimals'] = df.attrs['price_decimals']
+
+        valid = ~(np.isnan(fast) | np.isnan(slow) | np.isnan(atr_values))
+        for col in ('Open', 'High', 'Low', 'Close'):
+            if col in columns:
+                valid &= ~np.isnan(columns[col])
+        start = int(valid.argmax()) if valid.any() else len(valid)
+        if valid[start:].all():
+            return out.iloc[start:]
+        return out[valid]
+
+    def generate_signals(self, df):
+        """
+        陣列信號接口 (供 BacktestEngine.run_fast 使用)
+        輸入 prepare_indicators 的結果，一次性返回整段信號向量：
+        entries / exits 為布林陣列，sl_distance / tp_distance 為每根K線的止損/止盈距離
+        回測引擎只需負責與路徑相關的倉位計算 (position_size)
+        """
+        fast = df['SMA_Fast'].to_numpy(dtype=np.float64)
+        slow = df['SMA_Slow'].to_numpy(dtype=np.float64)
+        atr = df['ATR'].to_numpy(dtype=np.float64)
+
+        entries = np.zeros(len(df), dtype=bool)
+        exits = np.zeros(len(df), dtype=bool)
+        # 金叉 / 死叉 (與 get_signal 的判斷完全相同)
+        entries[1:] = (fast[:-1] < slow[:-1]) & (fast[1:] > slow[1:])
+        exits[1:] = (fast[:-1] > slow[:-1]) & (fast[1:] < slow[1:])
+
+        return {
+            'entries': entries,
+            'exits': exits,
+            'sl_distance': self.sl_atr_mult * atr,
+            'tp_distance': self.tp_atr_mult * atr,
+            'entry_reason': "Golden Cross",
+            'exit_reason': "Death Cross",
+        }
+
+    def position_size(self, balance, price, sl_distance, fee_rate):
+        """倉位計算：按風險比例計算理想倉位，並受資金限制 (包含手續費緩衝)"""
+        risk_amount = balance * self.risk_per_trade
+        theoretical_size = risk_amount / sl_distance if sl_distance > 0 else 0
+
+        max_affordable = balance / (price * (1 + fee_rate))
+        return min(theoretical_size, max_affordable)
+
+    def position_sizes(self, balance, prices, sl_distances, fee_rate):
+        """position_size 的陣列版本 (同一資金下多個候選進場點，逐元素結果與 position_size 相同)"""
+        risk_amount = balance * self.risk_per_trade
+        with np.errstate(divide='ignore', invalid='ignore'):
+            theoretical_size = np.where(sl_distances > 0, risk_amount / sl_distances, 0.0)
+
+        max_affordable = balance / (prices * (1 + fee_rate))
+        return np.minimum(theoretical_size, max_affordable)
+
     def get_signal(self, curr_row, prev_row, balance, fee_rate):
         """
         輸入當前K線，返回交易指令
@@ -37,17 +161,12 @@ class StrategySMA_ATR:
         if prev_row['SMA_Fast'] < prev_row['SMA_Slow'] and curr_row['SMA_Fast'] > curr_row['SMA_Slow']:
             
             # --- Risk Matrix 計算 ---
-            sl_distance = 2.0 * atr
+            sl_distance = self.sl_atr_mult * atr
             calc_stop_loss = price - sl_distance
-            calc_take_profit = price + (3.0 * atr)
-            
-            # 倉位計算
-            risk_amount = balance * self.risk_per_trade
-            theoretical_size = risk_amount / sl_distance if sl_distance > 0 else 0
+            calc_take_profit = price + (self.tp_atr_mult * atr)
             
-            # 資金限制 (包含手續費緩衝)
-            max_affordable = balance / (price * (1 + fee_rate))
-            final_size = min(theoretical_size, max_affordable)
+            # 倉位計算 (包含資金限制)
+            final_size = self.position_size(balance, price, sl_distance, fee_rate)
             
             return 'BUY', final_size, calc_stop_loss, calc_take_profit, "Golden Cross"
 
@@ -1,6 +1,12 @@
+import os
+import sys
 import pandas as pd
 import numpy as np
 import matplotlib.pyplot as plt
+from indicators import sma, atr
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from plotting import decimate
 
 # ==========================================
 # 1. 核心邏輯類 (Strategy & Risk)
@@ -17,18 +23,13 @@ class TradingSystem:
     def calculate_indicators(self, df):
         """計算技術指標"""
         df = df.copy()
-        # 1. 策略指標: 雙均線
-        df['SMA_Fast'] = df['Close'].rolling(window=20).mean()
-        df['SMA_Slow'] = df['Close'].rolling(window=50).mean()
+        # 1. 策略指標: 雙均線 (與 StrategySMA_ATR 共用指標快取)
+        df['SMA_Fast'] = sma(df, 20)
+        df['SMA_Slow'] = sma(df, 50)
         
         # 2. 風控指標: ATR (衡量市場波動率)
         # 用於動態計算止損距離
-        high_low = df['High'] - df['Low']
-        high_close = np.abs(df['High'] - df['Close'].shift())
-        low_close = np.abs(df['Low'] - df['Close'].shift())
-        ranges = pd.concat([high_low, high_close, low_close], axis=1)
-        true_range = np.max(ranges, axis=1)
-        df['ATR'] = true_range.rolling(window=14).mean()
+        df['ATR'] = atr(df, 14)
         
         return df.dropna()
 
@@ -165,17 +166,25 @@ result_df, signals = system.run_backtest(backtest_df)
 print("正在繪製圖表...")
 fig, (ax1, ax2) = plt.subplots(2, 1, figsize=(14, 10), sharex=True, gridspec_kw={'height_ratios': [2, 1]})
 
+# 按圖表像素寬度降採樣 (每個像素保留最高/最低點)，100 萬點不再逐點繪製
+width_px = fig.get_figwidth() * fig.dpi
+
+def plot_decimated(ax, series, **kwargs):
+    values = series.to_numpy()
+    idx = decimate(values, width_px)
+    ax.plot(series.index[idx], values[idx], **kwargs)
+
 # --- 上圖：價格與指標 ---
-ax1.plot(result_df.index, result_df['Close'], label='Price', color='gray', alpha=0.3)
-ax1.plot(result_df.index, result_df['SMA_Fast'], label='SMA 20', color='orange', alpha=0.8)
-ax1.plot(result_df.index, result_df['SMA_Slow'], label='SMA 50', color='blue', alpha=0.8)
+plot_decimated(ax1, result_df['Close'], label='Price', color='gray', alpha=0.3)
+plot_decimated(ax1, result_df['SMA_Fast'], label='SMA 20', color='orange', alpha=0.8)
+plot_decimated(ax1, result_df['SMA_Slow'], label='SMA 50', color='blue', alpha=0.8)
 
-# 標記箭頭
-for timestamp, price, type_ in signals:
-    if type_ == 'BUY':
-        ax1.scatter(timestamp, price, marker='^', color='green', s=100, zorder=5)
-    elif type_ == 'SELL':
-        ax1.scatter(timestamp, price, marker='v', color='red', s=100, zorder=5)
+# 標記箭頭 (買/賣各一次 scatter 批量繪製)
+if signals:
+    signal_times, signal_prices, signal_types = (np.array(col) for col in zip(*signals))
+    buy, sell = signal_types == 'BUY', signal_types == 'SELL'
+    ax1.scatter(signal_times[buy], signal_prices[buy], marker='^', color='green', s=100, zorder=5)
+    ax1.scatter(signal_times[sell], signal_prices[sell], marker='v', color='red', s=100, zorder=5)
 
 ax1.set_title('Strategy: SMA Cross + ATR Risk Matrix')
 ax1.set_ylabel('Price (USD)')
@@ -187,13 +196,17 @@ equity_data = system.equity_curve
 # 確保長度一致
 equity_plot = equity_data[-len(result_df):] if len(equity_data) > len(result_df) else equity_data
 
-ax2.plot(result_df.index[:len(equity_plot)], equity_plot, color='black', linewidth=1.5, label='Total Equity')
+equity_plot = np.asarray(equity_plot)
+eq_idx = decimate(equity_plot, width_px)
+eq_times, eq_values = result_df.index[:len(equity_plot)][eq_idx], equity_plot[eq_idx]
+
+ax2.plot(eq_times, eq_values, color='black', linewidth=1.5, label='Total Equity')
 # 繪製盈虧背景色 (綠色=賺錢, 紅色=虧錢)
 ax2.axhline(y=10000, color='blue', linestyle='--', alpha=0.5, label='Initial Capital')
-ax2.fill_between(result_df.index[:len(equity_plot)], 10000, equity_plot, 
-                 where=(np.array(equity_plot) >= 10000), facecolor='green', alpha=0.2)
-ax2.fill_between(result_df.index[:len(equity_plot)], 10000, equity_plot, 
-                 where=(np.array(equity_plot) < 10000), facecolor='red', alpha=0.2)
+ax2.fill_between(eq_times, 10000, eq_values, 
+                 where=(eq_values >= 10000), facecolor='green', alpha=0.2)
+ax2.fill_between(eq_times, 10000, eq_values, 
+                 where=(eq_values < 10000), facecolor='red', alpha=0.2)
 
 ax2.set_title(f'Capital Graph (Final Equity: {system.balance:.2f} USD)')
 ax2.set_ylabel('Balance (USD)')
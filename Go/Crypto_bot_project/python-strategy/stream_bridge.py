@@ -0,0 +1,330 @@
+"""
+Go collector -> Python 策略端的本地橋接服務
+
+go-collector 把每個 Tick 以一行 JSON 寫入 Unix socket (預設 /tmp/crypto_ticks.sock)：
+    {"s": "BTCUSDT", "c": "42000.10", "E": 交易所事件時間(毫秒), "t": collector 收到時間(納秒)}
+
+本模組：
+- 讀取線程只負責收 bytes、切行，整批放進有界隊列 (隊列滿時丟棄並計數，不會阻塞 collector)
+- 處理線程整批解碼 JSON，增量合成一分鐘K線，K線收盤時調用 IncrementalSMA_ATR 得到交易指令
+- 記錄每個 Tick 從 collector 收到到策略處理完成的延遲直方圖，以及丟棄/解碼錯誤計數
+"""
+import os
+import json
+import time
+import queue
+import socket
+import argparse
+import threading
+
+import numpy as np
+
+from strategy import StrategySMA_ATR
+from incremental import IncrementalSMA_ATR
+
+DEFAULT_SOCKET = '/tmp/crypto_ticks.sock'
+MINUTE_NS = 60 * 10**9
+
+class LatencyHistogram:
+    """對數分桶的延遲直方圖 (微秒)，支持整批記錄"""
+    def __init__(self, max_us=10**7):
+        # 1us, 2us, 4us, ... 直到 max_us
+        self.edges = np.concatenate(([0.0], 2.0 ** np.arange(0, int(np.log2(max_us)) + 2)))
+        self.counts = np.zeros(len(self.edges), dtype=np.int64) # 最後一格是溢出
+        self.total = 0
+        self.max_us = 0.0
+
+    def record(self, latencies_ns):
+        us = np.asarray(latencies_ns, dtype=np.float64) / 1000.0
+        if len(us) == 0:
+            return
+        bucket = np.searchsorted(self.edges, us, side='right') - 1
+        np.add.at(self.counts, np.clip(bucket, 0, len(self.counts) - 1), 1)
+        self.total += len(us)
+        self.max_us = max(self.max_us, float(us.max()))
+
+    def percentile(self, p):
+        """返回落在第 p 百分位的分桶上界 (微秒)"""
+        if self.total == 0:
+            return 0.0
+        rank = np.searchsorted(np.cumsum(self.counts), self.total * p / 100.0)
+        rank = min(rank, len(self.edges) - 1)
+        upper = self.edges[rank + 1] if rank + 1 < len(self.edges) else self.max_us
+        return float(min(upper, self.max_us))
+
+    def summary(self):
+        return {'count': self.total, 'p50_us': self.percentile(50), 'p90_us': self.percentile(90),
+                'p99_us': self.percentile(99), 'max_us': self.max_us}
+
+class MinuteBarBuilder:
+    """
+    以 Tick 增量合成一分鐘K線 (每個品種一根進行中的K線)
+    記錄每個品種最後收盤的分鐘：K線 (包括 flush 強制收盤的) 收盤後才到的遲到 Tick 直接丟棄並計數，
+    不會重開同一分鐘、重複輸出K線
+    latest: 目前見過的最大 Tick 時間 (交易所事件時間)，作為 flush 的時鐘
+    """
+    def __init__(self):
+        self._bars = {}
+        self._last_closed = {}
+        self.late = 0
+        self.latest = None
+
+    def update(self, symbol, price, ts_ns):
+        """加入一個 Tick；跨分鐘時返回剛收盤的K線，否則返回 None"""
+        if self.latest is None or ts_ns > self.latest:
+            self.latest = ts_ns
+        minute = ts_ns - ts_ns % MINUTE_NS
+        if minute <= self._last_closed.get(symbol, -1):
+            self.late += 1
+            return None
+        bar = self._bars.get(symbol)
+        closed = None
+        if bar is not None and minute > bar['time']:
+            closed = bar
+            self._last_closed[symbol] = bar['time']
+            bar = None
+        if bar is None:
+            self._bars[symbol] = {'symbol': symbol, 'time': minute, 'Open': price, 'High': price,
+                                  'Low': price, 'Close': price, 'Volume': 1}
+        elif minute == bar['time']:
+            if price > bar['High']: bar['High'] = price
+            if price < bar['Low']: bar['Low'] = price
+            bar['Close'] = price
+            bar['Volume'] += 1 # 沒有成交量時以 Tick 數代替
+        return closed
+
+    def flush(self, now_ns, grace_ns=0):
+        """
+        收盤時間已過 (加寬限期) 但還沒有新 Tick 的K線，強制收盤
+        now_ns 應與 Tick 同一時鐘 (例如 latest)；用本機時間時，時鐘偏差或回放舊數據會讓K線提前收盤
+        """
+        closed = []
+        for symbol, bar in list(self._bars.items()):
+            if now_ns >= bar['time'] + MINUTE_NS + grace_ns:
+                closed.append(bar)
+                self._last_closed[symbol] = bar['time']
+                del self._bars[symbol]
+        return closed
+
+class TickBridge:
+    """
+    Unix socket 橋接服務
+    on_signal(symbol, bar, signal) 在每根K線收盤且指標預熱完成後調用，signal 與 get_signal 返回值相同
+    on_bar(bar) 在每根K線收盤時調用 (例如轉交給 paper_trader.PaperTrader)
+    沒有 on_signal 時不計算指標，只輸出K線 (模擬盤自己維護指標，避免重複計算)
+    """
+    def __init__(self, path=DEFAULT_SOCKET, strategy_factory=StrategySMA_ATR, balance=10000, fee_rate=0.001,
+                 on_signal=None, on_bar=None, max_queue=1024, max_batch=512, bar_grace_ms=500):
+        self.path = path
+        self.strategy_factory = strategy_factory
+        self.balance = balance
+        self.fee_rate = fee_rate
+        self.on_signal = on_signal
+        self.on_bar = on_bar
+        self.max_batch = max_batch
+        self.bar_grace_ns = bar_grace_ms * 10**6
+
+        self._queue = queue.Queue(maxsize=max_queue) # 元素是一批原始行 (bytes list)
+        self._builder = MinuteBarBuilder()
+        self._engines = {}
+        self._stop = threading.Event()
+        self._threads = []
+        self._server = None
+        self._lock = threading.Lock()
+
+        self.latency = LatencyHistogram()
+        self.counters = {'received': 0, 'decoded': 0, 'dropped': 0, 'decode_errors': 0, 'late_ticks': 0, 'bars': 0,
+                         'signals': 0}
+
+    # ---------- 生命週期 ----------
+
+    def start(self):
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+        self._server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self._server.bind(self.path)
+        self._server.listen(4)
+        self._server.settimeout(0.2)
+        self._spawn(self._accept_loop)
+        self._spawn(self._process_loop)
+        print(f"Tick bridge listening on {self.path}")
+        return self
+
+    def stop(self):
+        self._stop.set()
+        for t in self._threads:
+            t.join(timeout=2)
+        if self._server is not None:
+            self._server.close()
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+
+    def _spawn(self, target, *args):
+        t = threading.Thread(target=target, args=args, daemon=True)
+        t.start()
+        self._threads.append(t)
+
+    # ---------- 接收 (只切行，不解碼) ----------
+
+    def _accept_loop(self):
+        while not self._stop.is_set():
+            try:
+                conn, _ = self._server.accept()
+            except socket.timeout:
+                continue
+            except OSError:
+                break
+            self._spawn(self._read_loop, conn)
+
+    def _read_loop(self, conn):
+        conn.settimeout(0.2)
+        pending = b''
+        with conn:
+            while not self._stop.is_set():
+                try:
+                    data = conn.recv(65536)
+                except socket.timeout:
+                    continue
+                except OSError:
+                    break
+                if not data:
+                    break
+                lines = (pending + data).split(b'\n')
+                pending = lines.pop()
+                lines = [line for line in lines if line]
+                if lines:
+                    self._enqueue(lines)
+
+    def _enqueue(self, lines):
+        with self._lock:
+            self.counters['received'] += len(lines)
+        try:
+            self._queue.put_nowait(lines)
+        except queue.Full:
+            # 策略端跟不上時丟棄整批，保證延遲有上限
+            with self._lock:
+                self.counters['dropped'] += len(lines)
+
+    # ---------- 處理 (批量解碼 + 合成K線 + 策略) ----------
+
+    def _process_loop(self):
+        while not self._stop.is_set():
+            try:
+                lines = self._queue.get(timeout=0.1)
+            except queue.Empty:
+                lines = None
+
+            if lines is not None:
+                # 把隊列中已到達的批次合併，最多 max_batch 行
+                while len(lines) < self.max_batch:
+                    try:
+                        lines.extend(self._queue.get_nowait())
+                    except queue.Empty:
+                        break
+                self.process_lines(lines)
+
+            # 每輪都檢查：即使其他品種一直有 Tick，沒有新 Tick 的品種也在收盤 + 寬限期後收盤
+            # 時鐘是目前最大的事件時間而不是本機時間 (K線按事件時間分桶，兩者須一致)
+            if self._builder.latest is not None:
+                self._close_bars(self._builder.flush(self._builder.latest, self.bar_grace_ns))
+
+    def process_lines(self, lines):
+        """解碼一批原始行並驅動K線/策略；返回本批收盤的K線數"""
+        ticks = self._decode(lines)
+        late = self._builder.late
+        closed = []
+        recv_times = np.empty(len(ticks), dtype=np.int64)
+        for k, tick in enumerate(ticks):
+            recv_times[k] = tick.get('t') or time.time_ns()
+            ts_ns = int(tick['E']) * 10**6 if tick.get('E') else recv_times[k]
+            bar = self._builder.update(tick['s'], float(tick['c']), ts_ns)
+            if bar is not None:
+                closed.append(bar)
+        if self._builder.late != late:
+            with self._lock:
+                self.counters['late_ticks'] += self._builder.late - late
+        self._close_bars(closed)
+
+        # 延遲：collector 收到 -> 本批處理完成
+        self.latency.record(time.time_ns() - recv_times)
+        return len(closed)
+
+    def _decode(self, lines):
+        """
+        整批解碼：拼成一個 JSON 陣列只調用一次 json.loads；失敗時逐行解碼
+        無法解析的行與缺少 's' / 'c' 的記錄都計入 decode_errors
+        """
+        errors = 0
+        try:
+            ticks = json.loads(b'[' + b','.join(lines) + b']')
+        except ValueError:
+            ticks = []
+            for line in lines:
+                try:
+                    ticks.append(json.loads(line))
+                except ValueError:
+                    errors += 1
+        valid = [t for t in ticks if isinstance(t, dict) and 's' in t and 'c' in t]
+        errors += len(ticks) - len(valid)
+        with self._lock:
+            self.counters['decoded'] += len(valid)
+            self.counters['decode_errors'] += errors
+        return valid
+
+    def _close_bars(self, bars):
+        for bar in bars:
+            with self._lock:
+                self.counters['bars'] += 1
+            if self.on_bar is not None:
+                self.on_bar(bar)
+            if self.on_signal is None:
+                continue
+            engine = self._engines.get(bar['symbol'])
+            if engine is None:
+                engine = self._engines[bar['symbol']] = IncrementalSMA_ATR(self.strategy_factory())
+            if engine.update(bar['High'], bar['Low'], bar['Close'], bar['time']) is None:
+                continue
+            signal = engine.signal(self.balance, self.fee_rate)
+            if signal[0] != 'HOLD':
+                with self._lock:
+                    self.counters['signals'] += 1
+            if self.on_signal is not None:
+                self.on_signal(bar['symbol'], bar, signal)
+
+    def stats(self):
+        """計數器與延遲分位數"""
+        with self._lock:
+            stats = dict(self.counters)
+        stats['queue_depth'] = self._queue.qsize()
+        stats['latency'] = self.latency.summary()
+        return stats
+
+def send_ticks(path, ticks):
+    """本地測試用：模擬 go-collector，把 Tick (dict) 逐行寫入 socket"""
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.connect(path)
+        payload = b''.join(json.dumps(dict(t, t=time.time_ns())).encode() + b'\n' for t in ticks)
+        sock.sendall(payload)
+
+def main():
+    parser = argparse.ArgumentParser(description='Go collector -> Python strategy bridge')
+    parser.add_argument('--socket', default=os.environ.get('CRYPTO_BRIDGE_SOCKET', DEFAULT_SOCKET))
+    parser.add_argument('--stats-every', type=float, default=30.0, help='seconds between stats reports')
+    args = parser.parse_args()
+
+    def on_signal(symbol, bar, signal):
+        if signal[0] != 'HOLD':
+            print(f"[{symbol}] {signal[0]} @ {bar['Close']:.2f} ({signal[4]})")
+
+    bridge = TickBridge(args.socket, on_signal=on_signal).start()
+    try:
+        while True:
+            time.sleep(args.stats_every)
+            print(bridge.stats())
+    except KeyboardInterrupt:
+        pass
+    finally:
+        bridge.stop()
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
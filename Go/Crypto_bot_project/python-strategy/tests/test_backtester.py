@@ -0,0 +1,44 @@
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(HERE)
+sys.path[:0] = [ROOT, os.path.join(ROOT, 'strategies')]
+
+from indicators import IndicatorCache
+from strategy import StrategySMA_ATR
+from backtester import BacktestEngine
+
+def _frame(n=3_000, seed=1):
+    rng = np.random.default_rng(seed)
+    close = (30000 + np.cumsum(rng.normal(0, 20, n))).round(2)
+    open_ = np.concatenate(([close[0]], close[:-1]))
+    high = (np.maximum(open_, close) + np.abs(rng.normal(0, 15, n))).round(2)
+    low = (np.minimum(open_, close) - np.abs(rng.normal(0, 15, n))).round(2)
+    index = pd.date_range('2020-01-01', periods=n, freq='1min', name='datetime')
+    return pd.DataFrame({'Open': open_, 'High': high, 'Low': low, 'Close': close}, index=index)
+
+def _strategy():
+    return StrategySMA_ATR(5, 15, 14, indicator_cache=IndicatorCache())
+
+@pytest.mark.parametrize('exit_mode, same_bar_rule, slippage', [
+    ('close', 'stop_first', 0.0),
+    ('intrabar', 'stop_first', 0.0005),
+    ('intrabar', 'target_first', 0.0005),
+])
+def test_run_matches_run_fast(exit_mode, same_bar_rule, slippage):
+    df = _frame()
+    engines = [BacktestEngine(exit_mode=exit_mode, same_bar_rule=same_bar_rule, slippage=slippage) for _ in range(2)]
+    slow = engines[0].run(df, _strategy())
+    fast = engines[1].run_fast(df, _strategy())
+
+    assert len(engines[0].trades) > 10
+    assert slow.index.equals(fast.index)
+    np.testing.assert_array_equal(slow['equity'].to_numpy(), fast['equity'].to_numpy())
+    np.testing.assert_array_equal(engines[0].trades.array, engines[1].trades.array)
+    assert engines[0].signals == engines[1].signals
+    assert engines[0].balance == engines[1].balance
\ No newline at end of file
@@ -0,0 +1,54 @@
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+import pandas.testing as pdt
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(HERE)
+sys.path[:0] = [ROOT, os.path.join(ROOT, 'strategies')]
+
+from data_loader import DataLoader
+
+def _rows(n=6_000, seed=4):
+    """有缺口、重複時間戳 (值不同)、空值與少量亂序行的一分鐘K線"""
+    rng = np.random.default_rng(seed)
+    ts = 1577836800 + 60 * np.arange(n)
+    ts = ts[rng.random(n) > 0.02]
+    close = (30000 + np.cumsum(rng.normal(0, 5, len(ts)))).round(2)
+    df = pd.DataFrame({'Timestamp': ts, 'Open': close, 'High': close + 1, 'Low': close - 1, 'Close': close,
+                       'Volume': rng.random(len(ts)).round(4)})
+    dup = df.iloc[rng.choice(len(df), 20, replace=False)].copy()
+    dup['Volume'] += 1
+    df = pd.concat([df, dup]).sort_values('Timestamp', kind='stable').reset_index(drop=True)
+    df.loc[df.sample(10, random_state=1).index, 'Volume'] = np.nan
+    order = np.arange(len(df))
+    for k in rng.choice(len(df) - 500, 30, replace=False):
+        order[k], order[k + 300] = order[k + 300], order[k]
+    return df.iloc[order].reset_index(drop=True)
+
+def _assert_matches_load_data(loader, df):
+    expected = DataLoader(loader.filepath).load_data(use_cache=False).sort_index(kind='stable')
+    pdt.assert_frame_equal(df.copy(), expected, check_freq=False) # copy: 存儲的欄位是 memmap
+
+def test_load_range_matches_load_data(tmp_path):
+    rows = _rows()
+    csv = str(tmp_path / 'bars.csv')
+    rows.iloc[:4_000].to_csv(csv, index=False)
+
+    loader = DataLoader(csv)
+    _assert_matches_load_data(loader, loader.load_range())
+
+    # CSV 追加新行後，只解析新增部分，結果仍與整檔載入相同
+    rows.iloc[4_000:].to_csv(csv, mode='a', header=False, index=False)
+    _assert_matches_load_data(loader, loader.load_range())
+
+def test_load_range_slice_matches_load_data(tmp_path):
+    csv = str(tmp_path / 'bars.csv')
+    _rows().to_csv(csv, index=False)
+    start, end = pd.Timestamp('2020-01-02 06:00'), pd.Timestamp('2020-01-03 12:30')
+
+    got = DataLoader(csv).load_range(start, end)
+    full = DataLoader(csv).load_data(use_cache=False).sort_index(kind='stable')
+    pdt.assert_frame_equal(got.copy(), full[(full.index >= start) & (full.index < end)], check_freq=False)
\ No newline at end of file
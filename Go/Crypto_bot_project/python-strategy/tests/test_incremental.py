@@ -0,0 +1,36 @@
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(HERE)
+sys.path[:0] = [ROOT, os.path.join(ROOT, 'strategies')]
+
+from indicators import IndicatorCache
+from strategy import StrategySMA_ATR
+from incremental import IncrementalSMA_ATR
+
+def _frame(n=5_000, seed=2):
+    rng = np.random.default_rng(seed)
+    close = (30000 + np.cumsum(rng.normal(0, 5, n))).round(2)
+    close[1000:1200] = close[1000] # 價格不變的區段 (滾動均值的等值分支)
+    index = pd.date_range('2020-01-01', periods=n, freq='1min', name='datetime')
+    return pd.DataFrame({'Open': close, 'High': close + 1.5, 'Low': close - 1.5, 'Close': close}, index=index)
+
+def test_incremental_matches_prepare_indicators():
+    df = _frame()
+    strategy = StrategySMA_ATR(20, 50, 14, indicator_cache=IndicatorCache())
+    expected = strategy.prepare_indicators(df)
+
+    engine = IncrementalSMA_ATR(strategy)
+    rows = []
+    for t, h, l, c in zip(df.index, df['High'], df['Low'], df['Close']):
+        row = engine.update(h, l, c, t)
+        if row is not None:
+            rows.append(row)
+
+    assert [row['time'] for row in rows] == list(expected.index)
+    for col in ('SMA_Fast', 'SMA_Slow', 'ATR'):
+        np.testing.assert_array_equal([row[col] for row in rows], expected[col].to_numpy())
\ No newline at end of file
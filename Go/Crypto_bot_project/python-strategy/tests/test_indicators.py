@@ -0,0 +1,34 @@
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(HERE)
+sys.path[:0] = [ROOT, os.path.join(ROOT, 'strategies')]
+
+from indicators import IndicatorCache, dataset_fingerprint, sma
+
+def _frame(n=50_000, seed=0):
+    rng = np.random.default_rng(seed)
+    close = 30000 + np.cumsum(rng.normal(0, 5, n)).round(2)
+    index = pd.date_range('2020-01-01', periods=n, freq='1min', name='datetime')
+    return pd.DataFrame({'Open': close, 'High': close + 1, 'Low': close - 1, 'Close': close}, index=index)
+
+def test_fingerprint_changes_when_single_bar_changes():
+    df = _frame()
+    changed = df.copy()
+    changed.iloc[12_345, changed.columns.get_loc('Close')] *= 1.05
+    assert dataset_fingerprint(df) != dataset_fingerprint(changed)
+
+def test_cache_misses_after_single_bar_changes():
+    df = _frame()
+    changed = df.copy()
+    changed.iloc[12_345, changed.columns.get_loc('Close')] *= 1.05
+
+    cache = IndicatorCache()
+    sma(df, 20, cache=cache)
+    values = sma(changed, 20, cache=cache)
+    assert cache.stats()['misses'] == 2
+    np.testing.assert_array_equal(values, changed['Close'].rolling(20).mean().to_numpy())
\ No newline at end of file
@@ -0,0 +1,56 @@
+import os
+import sys
+import asyncio
+import functools
+
+import numpy as np
+import pandas as pd
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(HERE)
+sys.path[:0] = [ROOT, os.path.join(ROOT, 'strategies')]
+
+from indicators import IndicatorCache
+from strategy import StrategySMA_ATR
+from paper_trader import PaperTrader, replay_csv, verify_replay
+
+def _csv(path, n=4_000, seed=3):
+    rng = np.random.default_rng(seed)
+    close = (30000 + np.cumsum(rng.normal(0, 20, n))).round(2)
+    pd.DataFrame({'Timestamp': 1577836800 + 60 * np.arange(n), 'Open': close, 'High': close + 10,
+                  'Low': close - 10, 'Close': close, 'Volume': 1.0}).to_csv(path, index=False)
+    return str(path)
+
+def _factory():
+    return StrategySMA_ATR(5, 15, 14, indicator_cache=IndicatorCache())
+
+async def _first(bars, n):
+    """只取前 n 根K線 (模擬中途停止)"""
+    k = 0
+    async for bar in bars:
+        yield bar
+        k += 1
+        if k >= n:
+            return
+
+def test_replay_matches_run_fast(tmp_path):
+    assert verify_replay(_csv(tmp_path / 'bars.csv'), strategy_factory=_factory)
+
+def test_restart_matches_uninterrupted_run(tmp_path):
+    csv = _csv(tmp_path / 'bars.csv')
+    state = str(tmp_path / 'state.pkl')
+
+    first = PaperTrader(_factory, state_path=state, checkpoint_every=500)
+    asyncio.run(first.run({'BTC': _first(replay_csv(csv), 2_345)}))
+    resumed = PaperTrader(_factory, state_path=state, checkpoint_every=500)
+    asyncio.run(resumed.run({'BTC': replay_csv(csv)}))
+
+    reference = PaperTrader(_factory)
+    asyncio.run(reference.run({'BTC': replay_csv(csv)}))
+
+    a, b = resumed.sessions['BTC'], reference.sessions['BTC']
+    assert len(b.account.trades) > 10
+    np.testing.assert_array_equal(a.times, b.times)
+    np.testing.assert_array_equal(a.equity, b.equity)
+    np.testing.assert_array_equal(a.account.trades.array, b.account.trades.array)
+    assert a.account.balance == b.account.balance
\ No newline at end of file
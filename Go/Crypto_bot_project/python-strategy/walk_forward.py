@@ -0,0 +1,152 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from strategy import StrategySMA_ATR
+from optimizer import share_frame, attach_frame, evaluate
+
+# Worker 進程內的共享數據 (由 _init_worker 設置)
+_WORKER = {}
+
+def _init_worker(spec, strategy_cls, param_sets, initial_balance, fee_rate, rank_by):
+    shm, df = attach_frame(spec)
+    _WORKER.update(shm=shm, df=df, strategy_cls=strategy_cls, param_sets=param_sets,
+                   initial_balance=initial_balance, fee_rate=fee_rate, rank_by=rank_by)
+
+def _run_fold(fold):
+    """
+    單個 fold：在樣本內窗口優化參數，再用最佳參數跑下一段樣本外窗口
+    樣本外回測前面拼接樣本內窗口末尾 warmup_bars 根K線預熱指標，權益從 test_start 開始，
+    拼接後的樣本外曲線在 fold 之間沒有缺口
+    """
+    df = _WORKER['df']
+    strategy_cls = _WORKER['strategy_cls']
+    balance, fee_rate, rank_by = _WORKER['initial_balance'], _WORKER['fee_rate'], _WORKER['rank_by']
+
+    # iloc 位置切片是零拷貝視圖
+    train = df.iloc[fold['train_start']:fold['train_end']]
+
+    best_params, best_summary = None, None
+    for params in _WORKER['param_sets']:
+        summary, _ = evaluate(train, strategy_cls, params, balance, fee_rate)
+        if best_summary is None or summary[rank_by] > best_summary[rank_by]:
+            best_params, best_summary = params, summary
+
+    warmup = getattr(strategy_cls(**best_params), 'warmup_bars', 0)
+    test = df.iloc[max(fold['test_start'] - warmup, 0):fold['test_end']]
+    oos_summary, oos_equity = evaluate(test, strategy_cls, best_params, balance, fee_rate,
+                                       start=df.index[fold['test_start']])
+    return {
+        'fold': fold,
+        'params': best_params,
+        'is_summary': best_summary,
+        'oos_summary': oos_summary,
+        'oos_epoch': oos_equity.index.values.astype('datetime64[ns]').view('int64'),
+        'oos_equity': oos_equity.to_numpy(),
+    }
+
+class WalkForward:
+    """
+    滾動 / 擴展 (anchored) Walk-Forward 分析
+    - rolling: 樣本內窗口長度固定，每次向前移動 step 根K線
+    - anchored: 樣本內窗口起點固定在數據開頭，長度每次增加 step
+    每個 fold 在樣本內窗口上做參數優化，再用最佳參數跑緊接著的樣本外窗口；
+    各 fold 在進程池中並行執行，數據經共享記憶體零拷貝傳遞
+    """
+    def __init__(self, df, param_sets, train_bars, test_bars, step=None, anchored=False,
+                 initial_balance=10000, fee_rate=0.001, strategy_cls=StrategySMA_ATR,
+                 workers=None, rank_by='total_return', columns=('Open', 'High', 'Low', 'Close', 'Volume')):
+        step = step or test_bars
+        if step < test_bars:
+            raise ValueError("step must be >= test_bars so out-of-sample windows do not overlap")
+
+        self.df = df
+        self.param_sets = list(param_sets)
+        self.train_bars = train_bars
+        self.test_bars = test_bars
+        self.step = step
+        self.anchored = anchored
+        self.initial_balance = initial_balance
+        self.fee_rate = fee_rate
+        self.strategy_cls = strategy_cls
+        self.workers = workers or os.cpu_count() or 1
+        self.rank_by = rank_by
+        self.columns = [c for c in columns if c in df.columns]
+
+        self.report = None
+        self.oos_equity = None
+
+    def folds(self):
+        """生成所有 fold 的位置區間 (半開區間 [start, end))"""
+        n = len(self.df)
+        folds = []
+        k = 0
+        while True:
+            train_end = self.train_bars + k * self.step
+            test_end = min(train_end + self.test_bars, n)
+            if train_end >= n:
+                break
+            train_start = 0 if self.anchored else train_end - self.train_bars
+            folds.append({'index': k, 'train_start': train_start, 'train_end': train_end,
+                          'test_start': train_end, 'test_end': test_end})
+            k += 1
+        return folds
+
+    def run(self):
+        """並行執行所有 fold，返回 (拼接後的樣本外權益曲線, 每個 fold 的報告)"""
+        folds = self.folds()
+        mode = 'anchored' if self.anchored else 'rolling'
+        print(f"--- Walk-Forward ({mode}): {len(folds)} folds x {len(self.param_sets)} param sets, {self.workers} workers ---")
+        if not folds:
+            return pd.Series(dtype=np.float64), pd.DataFrame()
+
+        shm, spec = share_frame(self.df, self.columns)
+        try:
+            with ProcessPoolExecutor(max_workers=self.workers, initializer=_init_worker,
+                                     initargs=(spec, self.strategy_cls, self.param_sets,
+                                               self.initial_balance, self.fee_rate, self.rank_by)) as pool:
+                results = list(pool.map(_run_fold, folds))
+        finally:
+            shm.close()
+            shm.unlink()
+
+        self.oos_equity = self._stitch(results)
+        self.report = self._build_report(results)
+        return self.oos_equity, self.report
+
+    def _stitch(self, results):
+        """
+        拼接樣本外權益：每個 fold 都以 initial_balance 起跑，
+        按上一段的期末權益等比縮放後首尾相接 (等同複利滾動資金)
+        """
+        pieces = []
+        capital = float(self.initial_balance)
+        for r in results:
+            equity = r['oos_equity']
+            if len(equity) == 0:
+                continue
+            scale = capital / self.initial_balance
+            index = pd.DatetimeIndex(r['oos_epoch'].view('datetime64[ns]'), name='time')
+            pieces.append(pd.Series(equity * scale, index=index))
+            capital = float(equity[-1] * scale)
+        if not pieces:
+            return pd.Series(dtype=np.float64, name='equity')
+        return pd.concat(pieces).rename('equity')
+
+    def _build_report(self, results):
+        index = self.df.index
+        rows = []
+        for r in results:
+            f = r['fold']
+            row = {
+                'fold': f['index'],
+                'train_start': index[f['train_start']], 'train_end': index[f['train_end'] - 1],
+                'test_start': index[f['test_start']], 'test_end': index[f['test_end'] - 1],
+            }
+            row.update(r['params'])
+            row.update({f'is_{k}': v for k, v in r['is_summary'].items()})
+            row.update({f'oos_{k}': v for k, v in r['oos_summary'].items()})
+            rows.append(row)
+        return pd.DataFrame(rows)
\ No newline at end of file